@@ -0,0 +1,41 @@
+"""add llm context length
+
+Revision ID: 085f5b1a850d
+Revises: 308e1de2fd36
+Create Date: 2026-10-18 09:12:40.215877
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "085f5b1a850d"
+down_revision: Union[str, None] = "308e1de2fd36"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Both Typhoon 1.5 models are served with an 8k context window
+    op.execute(
+        """
+        UPDATE llms
+        SET params = (params::jsonb || '{"contextLength": 8192}')::json
+        WHERE fullname IN (
+            'scb10x/llama-3-typhoon-v1.5-8b-instruct',
+            'scb10x/llama-3-typhoon-v1.5x-70b-instruct'
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        UPDATE llms
+        SET params = (params::jsonb - 'contextLength')::json
+        """
+    )
@@ -0,0 +1,54 @@
+"""add chat history indexes
+
+Revision ID: 308e1de2fd36
+Revises: 82c39dd3bcf6
+Create Date: 2026-10-18 08:27:18.833313
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "308e1de2fd36"
+down_revision: Union[str, None] = "82c39dd3bcf6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Build the indexes without locking writes on large tables
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_chat_sessions_user_id_updated_at",
+            "chat_sessions",
+            ["user_id", sa.text("updated_at DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_messages_chat_session_id_created_at",
+            "messages",
+            ["chat_session_id", "created_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_messages_chat_session_id_created_at",
+            table_name="messages",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_chat_sessions_user_id_updated_at",
+            table_name="chat_sessions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
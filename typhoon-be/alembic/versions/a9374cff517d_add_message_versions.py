@@ -0,0 +1,120 @@
+"""add message versions
+
+Revision ID: a9374cff517d
+Revises: e62cb7f75d61
+Create Date: 2026-10-18 10:05:31.402117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a9374cff517d"
+down_revision: Union[str, None] = "e62cb7f75d61"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+preference = postgresql.ENUM(
+    "LIKE", "DISLIKE", "NA", name="preferenceenum", create_type=False
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "message_versions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("message_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("message", sa.Text(), nullable=True),
+        sa.Column("total_tokens", sa.Integer(), nullable=True),
+        sa.Column("token_speed", sa.DECIMAL(precision=10, scale=2), nullable=True),
+        sa.Column("preference", preference, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("superseded_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["message_id"], ["messages.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("message_id", "version"),
+    )
+    op.add_column(
+        "messages", sa.Column("current_version_id", sa.Integer(), nullable=True)
+    )
+
+    # Every existing message becomes its own first version
+    op.execute(
+        """
+        INSERT INTO message_versions (
+            message_id, version, message, total_tokens, token_speed,
+            preference, created_at
+        )
+        SELECT id, 1, message, total_tokens, token_speed,
+            coalesce(preference, 'NA'), coalesce(updated_at, created_at)
+        FROM messages
+        """
+    )
+    op.execute(
+        """
+        UPDATE messages
+        SET current_version_id = message_versions.id
+        FROM message_versions
+        WHERE message_versions.message_id = messages.id
+        """
+    )
+
+    op.create_foreign_key(
+        "fk_messages_current_version_id",
+        "messages",
+        "message_versions",
+        ["current_version_id"],
+        ["id"],
+        deferrable=True,
+        initially="DEFERRED",
+    )
+    op.create_index(
+        "ix_message_versions_current",
+        "message_versions",
+        ["message_id"],
+        unique=True,
+        postgresql_where=sa.text("superseded_at IS NULL"),
+    )
+    op.create_index(
+        "ix_message_versions_rated",
+        "message_versions",
+        ["preference", "created_at"],
+        postgresql_where=sa.text("preference <> 'NA'"),
+    )
+    op.drop_column("messages", "message")
+    op.drop_column("messages", "total_tokens")
+    op.drop_column("messages", "token_speed")
+    op.drop_column("messages", "preference")
+
+
+def downgrade() -> None:
+    op.add_column("messages", sa.Column("message", sa.Text(), nullable=True))
+    op.add_column("messages", sa.Column("total_tokens", sa.Integer(), nullable=True))
+    op.add_column(
+        "messages",
+        sa.Column("token_speed", sa.DECIMAL(precision=10, scale=2), nullable=True),
+    )
+    op.add_column("messages", sa.Column("preference", preference, nullable=True))
+    # Earlier versions are lost, messages keep the text of their current one
+    op.execute(
+        """
+        UPDATE messages
+        SET message = message_versions.message,
+            total_tokens = message_versions.total_tokens,
+            token_speed = message_versions.token_speed,
+            preference = message_versions.preference
+        FROM message_versions
+        WHERE message_versions.id = messages.current_version_id
+        """
+    )
+    op.drop_constraint("fk_messages_current_version_id", "messages", type_="foreignkey")
+    op.drop_column("messages", "current_version_id")
+    op.drop_index("ix_message_versions_rated", table_name="message_versions")
+    op.drop_index("ix_message_versions_current", table_name="message_versions")
+    op.drop_table("message_versions")
@@ -0,0 +1,157 @@
+"""partition messages by created_at
+
+Revision ID: d4e0cfcb907f
+Revises: a9374cff517d
+Create Date: 2026-10-18 10:21:47.530162
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4e0cfcb907f"
+down_revision: Union[str, None] = "a9374cff517d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+role = postgresql.ENUM("USER", "BOT", name="roleenum", create_type=False)
+
+
+def upgrade() -> None:
+    # A partitioned table has no unique key on id alone to reference
+    op.drop_constraint(
+        "message_versions_message_id_fkey", "message_versions", type_="foreignkey"
+    )
+    # The partition key must be set on every row
+    op.execute(
+        """
+        UPDATE messages SET created_at = coalesce(updated_at, now())
+        WHERE created_at IS NULL
+        """
+    )
+    op.alter_column("messages", "created_at", nullable=False)
+
+    op.rename_table("messages", "messages_legacy")
+    # A partition's primary key must include the partition key
+    op.drop_constraint("messages_pkey", "messages_legacy", type_="primary")
+    op.create_primary_key(
+        "messages_legacy_pkey", "messages_legacy", ["id", "created_at"]
+    )
+    op.execute(
+        "ALTER INDEX ix_messages_chat_session_id_created_at "
+        "RENAME TO ix_messages_legacy_chat_session_id_created_at"
+    )
+
+    op.create_table(
+        "messages",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('messages_id_seq'::regclass)"),
+            nullable=False,
+        ),
+        sa.Column("chat_session_id", sa.Integer(), nullable=True),
+        sa.Column("role", role, nullable=True),
+        sa.Column("current_version_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["chat_session_id"], ["chat_sessions.id"]),
+        sa.ForeignKeyConstraint(
+            ["current_version_id"],
+            ["message_versions.id"],
+            name="fk_messages_current_version_id",
+            deferrable=True,
+            initially="DEFERRED",
+        ),
+        sa.PrimaryKeyConstraint("id", "created_at"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    # Dropping an archived legacy partition must not take the sequence with it
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    op.create_index(
+        "ix_messages_chat_session_id_created_at",
+        "messages",
+        ["chat_session_id", "created_at"],
+    )
+
+    # Existing rows stay where they are as one partition covering everything
+    # up to the next month, monthly partitions take over from there
+    cutover = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                """
+                SELECT date_trunc('month', greatest(now(), max(created_at)), 'UTC')
+                    + interval '1 month'
+                FROM messages_legacy
+                """
+            )
+        )
+        .scalar()
+    )
+    op.execute(
+        "ALTER TABLE messages ATTACH PARTITION messages_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{cutover.isoformat()}')"
+    )
+    # Catches rows no monthly partition was created for yet,
+    # `python -m src.io.partitions` moves them out
+    op.execute("CREATE TABLE messages_default PARTITION OF messages DEFAULT")
+
+
+def downgrade() -> None:
+    # Rows of detached or archived partitions are not brought back
+    op.execute(
+        """
+        CREATE TABLE messages_unpartitioned (
+            LIKE messages INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+        )
+        """
+    )
+    op.execute("INSERT INTO messages_unpartitioned SELECT * FROM messages")
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages_unpartitioned.id")
+    op.drop_table("messages")
+    op.rename_table("messages_unpartitioned", "messages")
+    op.alter_column("messages", "created_at", nullable=True)
+    op.create_primary_key("messages_pkey", "messages", ["id"])
+    op.create_foreign_key(
+        "messages_chat_session_id_fkey",
+        "messages",
+        "chat_sessions",
+        ["chat_session_id"],
+        ["id"],
+    )
+    op.create_foreign_key(
+        "fk_messages_current_version_id",
+        "messages",
+        "message_versions",
+        ["current_version_id"],
+        ["id"],
+        deferrable=True,
+        initially="DEFERRED",
+    )
+    op.create_index(
+        "ix_messages_chat_session_id_created_at",
+        "messages",
+        ["chat_session_id", "created_at"],
+    )
+    op.execute(
+        """
+        DELETE FROM message_versions
+        WHERE NOT EXISTS (
+            SELECT 1 FROM messages WHERE messages.id = message_versions.message_id
+        )
+        """
+    )
+    op.create_foreign_key(
+        "message_versions_message_id_fkey",
+        "message_versions",
+        "messages",
+        ["message_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
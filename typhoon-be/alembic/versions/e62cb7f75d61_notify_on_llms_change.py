@@ -0,0 +1,45 @@
+"""notify on llms change
+
+Revision ID: e62cb7f75d61
+Revises: 085f5b1a850d
+Create Date: 2026-10-18 09:41:05.118442
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e62cb7f75d61"
+down_revision: Union[str, None] = "085f5b1a850d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Backend workers LISTEN on this channel (config.CATALOG_NOTIFY_CHANNEL)
+    # to reload their in-process catalog
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_llms_changed() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('llms_changed', TG_OP);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER llms_changed
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON llms
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_llms_changed()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS llms_changed ON llms")
+    op.execute("DROP FUNCTION IF EXISTS notify_llms_changed()")
@@ -0,0 +1,161 @@
+"""Offline load test for ``/api/llm/chat/v1``.
+
+Starts a fake OpenAI-compatible upstream and the backend app on background
+threads, then opens N concurrent SSE chat streams against the backend.
+
+    uv run python -m benchmarks.chat_stream --streams 200 --chunks 64
+"""
+
+import json
+import time
+import asyncio
+import argparse
+
+import httpx
+
+from benchmarks.common import (
+    LoopProbe,
+    StubTokenizer,
+    ThreadedServer,
+    summarize,
+)
+from benchmarks import fake_llm
+
+# Registered by build_backend, the lifespan (and so the llm catalog) is not run
+FAKE_MODEL = {
+    "id": 1,
+    "shortname": "fake-model",
+    "fullname": "stub/tokenizer",
+    "params": {},
+}
+
+
+def build_backend():
+    # pylint: disable=import-outside-toplevel
+    from src.app import app
+    from src.llmlib.admission import admission
+    from src.llmlib.registry import model_registry
+    from src.llmlib.tokenizer import tokenizer_registry
+
+    tokenizer = StubTokenizer()
+    tokenizer_registry.get = lambda _: tokenizer
+    tokenizer_registry.preload = lambda _: None
+    model_registry.apply([FAKE_MODEL])
+    # Every benchmark stream comes from the same host, i.e. the same "user"
+    admission.max_per_user = admission.max_streams
+    return app
+
+
+async def run_stream(client: httpx.AsyncClient, body: dict) -> dict:
+    start = time.perf_counter()
+    ttft = None
+    last = None
+    gaps = []
+    tokens = 0
+
+    async with client.stream("POST", "/api/llm/chat/v1", json=body) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "done":
+                break
+
+            now = time.perf_counter()
+            payload = json.loads(data)
+            tokens = payload.get("tokens", tokens)
+            if not payload.get("content"):
+                continue
+            if ttft is None:
+                ttft = now - start
+            else:
+                gaps.append(now - last)
+            last = now
+
+    return {"ttft": ttft or 0.0, "gaps": gaps, "tokens": tokens}
+
+
+async def drive(url: str, streams: int, body: dict) -> tuple[list[dict], float]:
+    limits = httpx.Limits(max_connections=streams, max_keepalive_connections=streams)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=None) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(run_stream(client, body) for _ in range(streams))
+        )
+        return results, time.perf_counter() - start
+
+
+def report(results: list[dict], elapsed: float, probe: LoopProbe) -> dict:
+    streams = len(results)
+    gaps = [gap for result in results for gap in result["gaps"]]
+    return {
+        "streams": streams,
+        "elapsed_s": elapsed,
+        "tokens_total": sum(result["tokens"] for result in results),
+        "ttft_ms": summarize([result["ttft"] for result in results]),
+        "inter_chunk_ms": summarize(gaps),
+        "loop_lag_ms": summarize(probe.lags),
+        "cpu_per_stream_ms": probe.cpu_time / streams * 1000 if streams else 0.0,
+    }
+
+
+def print_report(stats: dict):
+    print(f"streams            {stats['streams']}")
+    print(f"elapsed            {stats['elapsed_s']:.2f}s")
+    print(f"tokens (reported)  {stats['tokens_total']}")
+    for key in ("ttft_ms", "inter_chunk_ms", "loop_lag_ms"):
+        row = stats[key]
+        print(
+            f"{key:<18} p50={row['p50']:.2f} p90={row['p90']:.2f} "
+            f"p99={row['p99']:.2f} max={row['max']:.2f}"
+        )
+    print(f"cpu_per_stream_ms  {stats['cpu_per_stream_ms']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--chunks", type=int, default=64)
+    parser.add_argument("--chunk-delay", type=float, default=0.01)
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    parser.add_argument("--words-per-chunk", type=int, default=3)
+    parser.add_argument(
+        "--usage", action="store_true", help="send provider usage in the stream"
+    )
+    parser.add_argument("--json", action="store_true", help="print raw JSON stats")
+    args = parser.parse_args()
+
+    upstream_app = fake_llm.create_app(
+        chunks=args.chunks,
+        chunk_delay=args.chunk_delay,
+        first_token_delay=args.first_token_delay,
+        words_per_chunk=args.words_per_chunk,
+        send_usage=args.usage,
+    )
+
+    with ThreadedServer(upstream_app) as upstream:
+        # pylint: disable=import-outside-toplevel
+        from src import config
+
+        config.LLM_ENDPOINT = f"{upstream.url}/v1"
+        config.API_KEY = "benchmark"
+
+        probe = LoopProbe(build_backend())
+        with ThreadedServer(probe) as backend:
+            body = {
+                "messages": [{"role": "user", "content": "สวัสดีครับ"}],
+                "model_id": FAKE_MODEL["id"],
+                "params": {"temperature": 0.7, "outputLength": 512},
+            }
+            results, elapsed = asyncio.run(drive(backend.url, args.streams, body))
+            stats = report(results, elapsed, probe)
+
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print_report(stats)
+
+
+if __name__ == "__main__":
+    main()
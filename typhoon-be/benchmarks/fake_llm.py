@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import asyncio
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+def _chunk(model: str, delta: dict, finish_reason: str | None = None) -> str:
+    payload = {
+        "id": "chatcmpl-benchmark",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def create_app(
+    chunks: int = 64,
+    chunk_delay: float = 0.01,
+    first_token_delay: float = 0.05,
+    words_per_chunk: int = 3,
+    send_usage: bool = False,
+) -> Starlette:
+    """Fake OpenAI-compatible ``/v1/chat/completions`` endpoint.
+
+    Streams ``chunks`` deltas of ``words_per_chunk`` words with fixed delays so the
+    backend's own overhead is the only variable between runs.
+    """
+    content = " ".join(["ทดสอบ"] * words_per_chunk) + " "
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake-model")
+        include_usage = send_usage and body.get("stream_options", {}).get(
+            "include_usage", False
+        )
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_delay)
+            return JSONResponse(
+                {
+                    "id": "chatcmpl-benchmark",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": 1,
+                        "completion_tokens": words_per_chunk,
+                        "total_tokens": 1 + words_per_chunk,
+                    },
+                }
+            )
+
+        async def stream():
+            await asyncio.sleep(first_token_delay)
+            yield _chunk(model, {"role": "assistant", "content": ""})
+            for _ in range(chunks):
+                yield _chunk(model, {"content": content})
+                await asyncio.sleep(chunk_delay)
+            yield _chunk(model, {}, "stop")
+            if include_usage:
+                usage = {
+                    "id": "chatcmpl-benchmark",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [],
+                    "usage": {
+                        "prompt_tokens": 1,
+                        "completion_tokens": chunks * words_per_chunk,
+                        "total_tokens": 1 + chunks * words_per_chunk,
+                    },
+                }
+                yield f"data: {json.dumps(usage)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return Starlette(
+        routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])]
+    )
+
+
+def create_app_from_env() -> Starlette:
+    """Factory for running the fake upstream in its own process.
+
+    uvicorn --factory benchmarks.fake_llm:create_app_from_env
+    """
+    return create_app(
+        chunks=int(os.getenv("FAKE_LLM_CHUNKS", "64")),
+        chunk_delay=float(os.getenv("FAKE_LLM_CHUNK_DELAY", "0.01")),
+        first_token_delay=float(os.getenv("FAKE_LLM_FIRST_TOKEN_DELAY", "0.05")),
+        words_per_chunk=int(os.getenv("FAKE_LLM_WORDS_PER_CHUNK", "3")),
+    )
@@ -0,0 +1,143 @@
+"""p50/p99 latency of message registration against a local Postgres.
+
+Compares the previous ORM flow (user SELECT, session SELECT/flush, INSERT and
+COMMIT) with the single-statement CTE path. Requires a migrated DATABASE_URL.
+
+    uv run python -m benchmarks.register_message --iterations 2000
+"""
+
+import time
+import asyncio
+import argparse
+import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from benchmarks.common import summarize
+from src.io.postgresql import async_session, engine
+from src.io import messages as messages_io
+from src.models import User, ChatSession, Message, MessageVersion, RoleEnum
+
+EMAIL = "benchmark-register@example.com"
+
+
+async def legacy_register(session, session_id: int | None) -> int:
+    record_datetime = datetime.datetime.now(datetime.timezone.utc)
+    async with session.begin():
+        result = await session.execute(select(User).where(User.email == EMAIL))
+        user = result.scalars().first()
+
+        chat_session = None
+        if session_id:
+            result = await session.execute(
+                select(ChatSession).where(
+                    ChatSession.id == session_id, ChatSession.user_id == user.id
+                )
+            )
+            chat_session = result.scalars().first()
+        if not chat_session:
+            chat_session = ChatSession(
+                user_id=user.id,
+                subject=messages_io.NEW_SESSION_SUBJECT,
+                created_at=record_datetime,
+                updated_at=record_datetime,
+            )
+            session.add(chat_session)
+            await session.flush()
+
+        message = Message(
+            chat_session_id=chat_session.id,
+            role=RoleEnum.USER,
+            created_at=record_datetime,
+            updated_at=record_datetime,
+        )
+        session.add(message)
+        await session.flush()
+        version = MessageVersion(
+            message_id=message.id,
+            version=1,
+            message="benchmark",
+            total_tokens=0,
+            token_speed="0",
+            created_at=record_datetime,
+        )
+        session.add(version)
+        await session.flush()
+        message.current_version_id = version.id
+        await session.commit()
+        return chat_session.id
+
+
+async def cte_register(session, session_id: int | None) -> int:
+    registered = await messages_io.register_message(
+        session,
+        email=EMAIL,
+        message="benchmark",
+        tokens=0,
+        token_speed=0.0,
+        role=RoleEnum.USER,
+        record_datetime=datetime.datetime.now(datetime.timezone.utc),
+        session_id=session_id,
+    )
+    return registered.session_id
+
+
+async def run(register, iterations: int, concurrency: int) -> list[float]:
+    latencies = []
+    session_ids: list[int | None] = [None] * concurrency
+
+    async def worker(idx: int, count: int):
+        for turn in range(count):
+            async with async_session() as session:
+                start = time.perf_counter()
+                # Every 10th turn opens a new session, like a first chat message
+                session_id = None if turn % 10 == 0 else session_ids[idx]
+                session_ids[idx] = await register(session, session_id)
+                latencies.append(time.perf_counter() - start)
+
+    per_worker = iterations // concurrency
+    await asyncio.gather(*(worker(idx, per_worker) for idx in range(concurrency)))
+    return latencies
+
+
+async def cleanup():
+    async with async_session() as session, session.begin():
+        user_id = (
+            await session.execute(select(User.id).where(User.email == EMAIL))
+        ).scalar()
+        if user_id is None:
+            session.add(User(email=EMAIL))
+            return
+        sessions = select(ChatSession.id).where(ChatSession.user_id == user_id)
+        messages = select(Message.id).where(Message.chat_session_id.in_(sessions))
+        await session.execute(
+            delete(MessageVersion).where(MessageVersion.message_id.in_(messages))
+        )
+        await session.execute(
+            delete(Message).where(Message.chat_session_id.in_(sessions))
+        )
+        await session.execute(delete(ChatSession).where(ChatSession.user_id == user_id))
+
+
+async def main(iterations: int, concurrency: int):
+    await cleanup()
+    for name, register in (("legacy", legacy_register), ("cte", cte_register)):
+        # Warm up the pool and the prepared statement cache
+        await run(register, concurrency * 5, concurrency)
+        latencies = await run(register, iterations, concurrency)
+        stats = summarize(latencies)
+        print(
+            f"{name:<7} n={len(latencies):<6} p50={stats['p50']:.2f}ms "
+            f"p99={stats['p99']:.2f}ms max={stats['max']:.2f}ms"
+        )
+        await cleanup()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.concurrency))
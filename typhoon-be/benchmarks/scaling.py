@@ -0,0 +1,183 @@
+"""Streams/s and tokens/s of the backend under gunicorn for several worker counts.
+
+Starts the fake upstream and ``gunicorn -c gunicorn.conf.py`` as subprocesses,
+then keeps a fixed number of chat streams open from separate client processes
+for ``--duration`` seconds per worker count. The lifespan loads the llm catalog,
+so a migrated DATABASE_URL is required.
+
+    uv run python -m benchmarks.scaling --workers 1,2,4 --duration 20
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+import multiprocessing
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import free_port, summarize
+from benchmarks.chat_stream import run_stream
+
+ROOT = Path(__file__).resolve().parent.parent
+BODY = {
+    "messages": [{"role": "user", "content": "สวัสดีครับ"}],
+    "params": {"temperature": 0.7, "outputLength": 512},
+}
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args[0]} exited with {process.returncode}")
+        try:
+            # Readiness answers 503 until the lifespan is done
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def closed_loop(
+    url: str, streams: int, duration: float, body: dict
+) -> list[dict]:
+    limits = httpx.Limits(max_connections=streams, max_keepalive_connections=streams)
+    deadline = time.perf_counter() + duration
+    results: list[dict] = []
+
+    async def user(client: httpx.AsyncClient):
+        while time.perf_counter() < deadline:
+            try:
+                results.append(await run_stream(client, body))
+            except httpx.HTTPError:
+                results.append({"error": True})
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=None) as client:
+        await asyncio.gather(*(user(client) for _ in range(streams)))
+    return results
+
+
+def client_process(args: tuple[str, int, float, dict]) -> list[dict]:
+    return asyncio.run(closed_loop(*args))
+
+
+def run_workers(args, workers: int, upstream_url: str) -> dict:
+    port = free_port()
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "BIND": f"127.0.0.1:{port}",
+        "LLM_ENDPOINT": f"{upstream_url}/v1",
+        "API_KEY": "benchmark",
+        "LOG_LEVEL": "WARNING",
+        "TOKENIZER_OFFLINE": "true",
+        # Every benchmark stream comes from the same host, i.e. the same "user";
+        # the stream limits are split across workers, let any one of them take
+        # every stream
+        "ADMISSION_MAX_PER_USER": str(args.streams),
+        "ADMISSION_MAX_STREAMS": str(args.streams * workers),
+        "LLM_MAX_CONCURRENT_STREAMS": str(args.streams * workers),
+    }
+    server = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "src.app:app"],
+        cwd=ROOT,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(f"{url}/api/health/ready/v1", server)
+        # Chat with the first model in the catalog, the fake upstream answers for any
+        llms = httpx.get(f"{url}/api/llm/params/v1").json()
+        body = {**BODY, "model_id": llms[0]["id"]}
+        share = [
+            (url, args.streams // args.clients, args.duration, body)
+            for _ in range(args.clients)
+        ]
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.clients) as pool:
+            results = [row for rows in pool.map(client_process, share) for row in rows]
+        elapsed = time.perf_counter() - start
+    finally:
+        stop(server)
+
+    completed = [result for result in results if not result.get("error")]
+    return {
+        "workers": workers,
+        "streams_per_s": len(completed) / elapsed,
+        "tokens_per_s": sum(result["tokens"] for result in completed) / elapsed,
+        "errors": len(results) - len(completed),
+        "ttft_ms": summarize([result["ttft"] for result in completed]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma separated counts")
+    parser.add_argument("--streams", type=int, default=200, help="open streams")
+    parser.add_argument("--clients", type=int, default=2, help="client processes")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--chunks", type=int, default=64)
+    parser.add_argument("--chunk-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    upstream_port = free_port()
+    upstream = subprocess.Popen(  # pylint: disable=consider-using-with
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "--factory",
+            "benchmarks.fake_llm:create_app_from_env",
+            "--port",
+            str(upstream_port),
+            "--workers",
+            "2",
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env={
+            **os.environ,
+            "FAKE_LLM_CHUNKS": str(args.chunks),
+            "FAKE_LLM_CHUNK_DELAY": str(args.chunk_delay),
+        },
+    )
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    try:
+        wait_ready(f"{upstream_url}/v1/chat/completions", upstream)
+        rows = [
+            run_workers(args, int(workers), upstream_url)
+            for workers in args.workers.split(",")
+        ]
+    finally:
+        stop(upstream)
+
+    print(f"cpus {os.cpu_count()}")
+    print("workers  streams/s  tokens/s  speedup  errors  ttft p50/p99 ms")
+    for row in rows:
+        print(
+            f"{row['workers']:>7}  {row['streams_per_s']:>9.1f}  "
+            f"{row['tokens_per_s']:>8.0f}  "
+            f"{row['streams_per_s'] / rows[0]['streams_per_s']:>6.2f}x  "
+            f"{row['errors']:>6}  "
+            f"{row['ttft_ms']['p50']:.1f}/{row['ttft_ms']['p99']:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
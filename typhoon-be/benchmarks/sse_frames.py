@@ -0,0 +1,108 @@
+"""SSE events/s per core of ``/api/llm/chat/v1`` for several framing settings.
+
+Streams many tiny upstream chunks through the backend once per mode and
+compares how many events, bytes and backend CPU seconds each mode needs.
+CPU time is that of the backend's event-loop thread; token counting runs on
+its own executor threads and is not included.
+
+    uv run python -m benchmarks.sse_frames --streams 50 --chunks 512
+"""
+
+import time
+import asyncio
+import argparse
+
+import httpx
+
+from benchmarks.common import LoopProbe, ThreadedServer
+from benchmarks.chat_stream import FAKE_MODEL, build_backend
+from benchmarks import fake_llm
+
+# (name, SSE_COALESCE_MS, SSE_STATS_EVERY)
+MODES = [
+    ("per-chunk", 0, 1),
+    ("stats/8", 0, 8),
+    ("coalesce 20ms", 20, 1),
+    ("coalesce 50ms stats/8", 50, 8),
+]
+BODY = {
+    "messages": [{"role": "user", "content": "สวัสดีครับ"}],
+    "model_id": FAKE_MODEL["id"],
+    "params": {"temperature": 0.7, "outputLength": 512},
+}
+
+
+async def read_stream(client: httpx.AsyncClient) -> tuple[int, int]:
+    events = received = 0
+    async with client.stream("POST", "/api/llm/chat/v1", json=BODY) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            events += 1
+            received += len(line) + 2
+            if line[5:].strip() == "done":
+                break
+    return events, received
+
+
+async def drive(url: str, streams: int) -> tuple[list[tuple[int, int]], float]:
+    limits = httpx.Limits(max_connections=streams, max_keepalive_connections=streams)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=None) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(read_stream(client) for _ in range(streams)))
+        return results, time.perf_counter() - start
+
+
+def print_row(
+    name: str, results: list[tuple[int, int]], cpu: float, elapsed: float, chunks: int
+):
+    events = sum(count for count, _ in results)
+    received = sum(size for _, size in results)
+    print(
+        f"{name:<24}{events:>9}{received / len(results) / 1024:>12.1f}"
+        f"{cpu:>8.2f}{events / cpu:>14.0f}"
+        f"{len(results) * chunks / cpu:>14.0f}{elapsed:>8.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--chunk-delay", type=float, default=0.002)
+    args = parser.parse_args()
+
+    upstream_app = fake_llm.create_app(
+        chunks=args.chunks,
+        chunk_delay=args.chunk_delay,
+        first_token_delay=0.0,
+        words_per_chunk=1,
+    )
+    with ThreadedServer(upstream_app) as upstream:
+        # pylint: disable=import-outside-toplevel
+        from src import config
+
+        config.LLM_ENDPOINT = f"{upstream.url}/v1"
+        config.API_KEY = "benchmark"
+        probe = LoopProbe(build_backend())
+
+        print(f"{args.streams} streams x {args.chunks} upstream chunks")
+        print(
+            f"{'mode':<24}{'events':>9}{'KiB/stream':>12}{'cpu s':>8}"
+            f"{'events/cpu-s':>14}{'chunks/cpu-s':>14}{'elapsed':>9}"
+        )
+        # One server for all modes, module-level clients are bound to its loop
+        with ThreadedServer(probe) as backend:
+            for name, coalesce_ms, stats_every in MODES:
+                config.SSE_COALESCE_MS = coalesce_ms
+                config.SSE_STATS_EVERY = stats_every
+                cpu_start = probe.cpu_time
+                results, elapsed = asyncio.run(drive(backend.url, args.streams))
+                time.sleep(0.05)
+                cpu = max(probe.cpu_time - cpu_start, 1e-9)
+                print_row(name, results, cpu, elapsed, args.chunks)
+
+
+if __name__ == "__main__":
+    main()
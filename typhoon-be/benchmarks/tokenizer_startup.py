@@ -0,0 +1,67 @@
+"""Compare tokenizer cold-start time and RSS: hub resolution vs build-time artifacts.
+
+uv run python -m src.llmlib.tokenizer_artifacts --out tokenizers
+uv run python -m benchmarks.tokenizer_startup --artifacts tokenizers
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+
+from src import config
+
+# Imports happen before the clock starts so only tokenizer loading is measured
+PROBE = """
+import json, resource, sys, time
+from transformers import AutoTokenizer
+from src.llmlib import tokenizer_artifacts
+mode, name, artifacts = sys.argv[1:4]
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if mode == "hub":
+    AutoTokenizer.from_pretrained(name, use_fast=True)
+else:
+    tokenizer_artifacts.load(artifacts, tokenizer_artifacts.read_manifest(artifacts)[name])
+elapsed = time.perf_counter() - start
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": elapsed, "rss_kib": after - before}))
+"""
+
+
+def measure(mode: str, name: str, artifacts: str) -> dict:
+    # Fresh interpreter per sample so nothing is cached in-process
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", PROBE, mode, name, artifacts],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--artifacts", default="tokenizers")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("models", nargs="*", default=config.TYPHOON_MODELS_NAME_IN_HF)
+    args = parser.parse_args()
+
+    for name in args.models:
+        for mode in ("hub", "artifact"):
+            try:
+                samples = [
+                    measure(mode, name, args.artifacts) for _ in range(args.repeat)
+                ]
+            except (subprocess.CalledProcessError, json.JSONDecodeError):
+                print(f"{name:<50} {mode:<9} unavailable")
+                continue
+            seconds = min(sample["seconds"] for sample in samples)
+            rss = min(sample["rss_kib"] for sample in samples)
+            print(
+                f"{name:<50} {mode:<9} {seconds * 1000:8.1f} ms {rss / 1024:8.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Gunicorn settings for running the backend with several uvicorn workers.
+
+    uv run gunicorn -c gunicorn.conf.py src.app:app
+
+The app is imported once in the master and tokenizers from the artifact
+manifest are loaded before forking, so every worker shares them copy-on-write.
+"""
+
+# pylint: disable=invalid-name
+import gc
+import os
+import tempfile
+import multiprocessing
+
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+# src.config splits the database connection budget by this, set it before the app loads
+os.environ["WEB_CONCURRENCY"] = str(workers)
+if workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    # Workers write their metrics here so /metrics sums them whichever one answers
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+preload_app = True
+keepalive = 5
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+# Open SSE streams get SSE_DRAIN_TIMEOUT to finish, plus a margin for lifespan shutdown
+graceful_timeout = int(float(os.getenv("SSE_DRAIN_TIMEOUT", "30"))) + 10
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded and before the first fork
+    from src.llmlib.tokenizer import (  # pylint: disable=import-outside-toplevel
+        tokenizer_registry,
+    )
+
+    loaded = tokenizer_registry.load_artifacts()
+    # Keep the preloaded objects out of the collector so it never writes to
+    # (and un-shares) their pages in the workers
+    gc.freeze()
+    server.log.info(f"Preloaded {loaded} tokenizers, forking {workers} workers")
+
+
+def child_exit(_, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import (  # pylint: disable=import-outside-toplevel
+            multiprocess,
+        )
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,15 +1,17 @@
 import sys
 from contextlib import asynccontextmanager
-from concurrent.futures import ThreadPoolExecutor
 
 from fastapi import FastAPI
-from sqlalchemy.future import select
 from loguru import logger
 
-from src.routers import llmdetails, registering, userdetails, llmchat
-from src.models import LLM
-from src.io.postgresql import get_session
-from src.llmlib.tokenizer import get_tokenizer
+from src.routers import llmdetails, registering, userdetails, llmchat, health, metrics
+from src.io.catalog import llm_catalog
+from src.io.jobs import job_pool
+from src.io.writebehind import message_writer
+from src.llmlib.tokenizer import tokenizer_registry
+from src.llmlib.registry import model_registry
+from src.llmlib.transport import close_http_client
+from src.metrics import MetricsMiddleware
 from src import config
 
 logger.remove()
@@ -18,22 +20,28 @@ logger.add(sys.stdout, level=config.LOG_LEVEL)
 
 @asynccontextmanager
 async def warm_tokenizer_cache(_: FastAPI):
-    async for session in get_session():
-        async with session.begin():
-            result = await session.execute(select(LLM))
-            llms = result.scalars().all()
-    logger.info("llms found: ", llms)
+    llm_catalog.subscribe(model_registry.apply)
+    await llm_catalog.start()
 
-    with ThreadPoolExecutor(5) as pool:
-        list(pool.map(get_tokenizer, [llm.fullname for llm in llms]))
-    logger.info("Finished warming tokenizer cache")
+    if config.MESSAGE_WRITE_BEHIND:
+        message_writer.start()
+    job_pool.start()
 
     yield
 
+    await job_pool.stop(config.JOB_DRAIN_TIMEOUT)
+    await message_writer.drain()
+    await llm_catalog.stop()
+    tokenizer_registry.shutdown()
+    await close_http_client()
+
 
 app = FastAPI(lifespan=warm_tokenizer_cache)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(llmdetails.router)
 app.include_router(userdetails.router)
 app.include_router(llmchat.router)
 app.include_router(registering.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
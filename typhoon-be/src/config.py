@@ -7,24 +7,148 @@ from dotenv import load_dotenv
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-POOL_SIZE = int(os.getenv("POOL_SIZE", "50"))
-MAX_OVERFLOW = int(os.getenv("MAX_OVERFLOW", "10"))
+# Gunicorn exports the worker count; the connection budget is split across workers
+# (each worker also holds one LISTEN connection for the llm catalog)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "60"))
+_WORKER_CONNECTIONS = max(2, DB_MAX_CONNECTIONS // WEB_CONCURRENCY - 1)
+MAX_OVERFLOW = int(os.getenv("MAX_OVERFLOW", str(min(10, _WORKER_CONNECTIONS // 5))))
+POOL_SIZE = int(os.getenv("POOL_SIZE", str(_WORKER_CONNECTIONS - MAX_OVERFLOW)))
 POOL_TIMEOUT = int(os.getenv("POOL_TIMEOUT", "30"))
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "200"))
+# Cached transcripts only follow their own worker's writes, so with several workers
+# the cache is off unless requests of a session are routed to one worker (sticky)
+HISTORY_CACHE_SESSIONS = int(
+    os.getenv("HISTORY_CACHE_SESSIONS", "1000" if WEB_CONCURRENCY == 1 else "0")
+)
 LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
+# Seconds an in-flight SSE stream may keep running after a shutdown signal
+SSE_DRAIN_TIMEOUT = float(os.getenv("SSE_DRAIN_TIMEOUT", "30"))
+# Upstream chunks arriving within this many ms go out as one SSE event, 0 sends each
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "0"))
+SSE_COALESCE_MAX_BYTES = int(os.getenv("SSE_COALESCE_MAX_BYTES", "4096"))
+# tokens/tokenSpeed ride along on every Kth event and always on the last one
+SSE_STATS_EVERY = int(os.getenv("SSE_STATS_EVERY", "1"))
+
+# Write-behind message ingestion
+MESSAGE_WRITE_BEHIND = os.getenv("MESSAGE_WRITE_BEHIND", "false").lower() == "true"
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.2"))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+WRITE_BEHIND_ID_BLOCK = int(os.getenv("WRITE_BEHIND_ID_BLOCK", "100"))
+# Streamed bot answers are appended to their row at most this often (seconds)
+ANSWER_FLUSH_INTERVAL = float(os.getenv("ANSWER_FLUSH_INTERVAL", "2.0"))
+
+# Monthly partitions of messages, kept up by `python -m src.io.partitions`:
+# this month's and the next PARTITION_MONTHS_AHEAD months' exist after a run
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+# Partitions ending more than this many months ago are dropped with their message
+# versions (or archived), 0 keeps them all
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "0"))
+
+# Background jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "1000"))
+JOB_MAX_RETRIES = int(os.getenv("JOB_MAX_RETRIES", "2"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "1.0"))
+JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", "10"))
+
+# LLM catalog
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "60"))
+# Fixed by the llms trigger (migration e62cb7f75d61), so not configurable
+CATALOG_NOTIFY_CHANNEL = "llms_changed"
+# Fallback when LISTEN is unavailable (e.g. behind a transaction pooler)
+CATALOG_POLL_INTERVAL = float(os.getenv("CATALOG_POLL_INTERVAL", "30"))
 
 # LLM
 LLM_ENDPOINT = os.getenv("LLM_ENDPOINT")
 API_KEY = os.getenv("API_KEY")
 TYPHOON_MODELS_NAME_IN_HF = [
     "scb10x/llama-3-typhoon-v1.5x-70b-instruct",
+    "scb10x/llama-3-typhoon-v1.5-8b-instruct",
     "scb10x/llama-3-typhoon-v1.5",
 ]
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "true").lower() == "true"
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "50"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+# Upstream streams of the whole server, each worker's transport gets its share
+_LLM_STREAMS = int(os.getenv("LLM_MAX_CONCURRENT_STREAMS", "200"))
+LLM_MAX_CONCURRENT_STREAMS = max(1, _LLM_STREAMS // WEB_CONCURRENCY)
+LLM_CLIENT_CACHE_SIZE = int(os.getenv("LLM_CLIENT_CACHE_SIZE", "32"))
+LLM_CLIENT_CACHE_TTL = float(os.getenv("LLM_CLIENT_CACHE_TTL", "3600"))
+
+# Admission control for chat streams. Stream and queue limits are for the whole
+# server and split across workers like the connection budget; the minimum the
+# adaptive limit shrinks to stays at least one stream per worker
+ADMISSION_MAX_STREAMS = max(
+    1,
+    int(os.getenv("ADMISSION_MAX_STREAMS", str(_LLM_STREAMS))) // WEB_CONCURRENCY,
+)
+ADMISSION_MIN_STREAMS = max(
+    1, int(os.getenv("ADMISSION_MIN_STREAMS", "8")) // WEB_CONCURRENCY
+)
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "100")) // WEB_CONCURRENCY
+# Per worker: a user's chats may land on any worker, so across the server one
+# user can hold up to this many streams on each of them
+ADMISSION_MAX_PER_USER = int(os.getenv("ADMISSION_MAX_PER_USER", "3"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+# Streams slower than this on average shrink the limit, 0 keeps it fixed
+ADMISSION_TARGET_TOKEN_SPEED = float(os.getenv("ADMISSION_TARGET_TOKEN_SPEED", "10"))
+# Seconds from admission (queueing included) until a stream is cut off
+STREAM_DEADLINE = float(os.getenv("STREAM_DEADLINE", "300"))
+
+# Token accounting
+TOKEN_COUNT_FLUSH_INTERVAL = float(os.getenv("TOKEN_COUNT_FLUSH_INTERVAL", "0.25"))
+TOKEN_COUNT_WORKERS = int(os.getenv("TOKEN_COUNT_WORKERS", "2"))
+TOKENIZER_MEMORY_BUDGET_MB = int(os.getenv("TOKENIZER_MEMORY_BUDGET_MB", "512"))
+TOKENIZER_LOAD_WORKERS = int(os.getenv("TOKENIZER_LOAD_WORKERS", "2"))
+APPROX_CHARS_PER_TOKEN = float(os.getenv("APPROX_CHARS_PER_TOKEN", "3.0"))
+TOKENIZER_ARTIFACT_DIR = os.getenv("TOKENIZER_ARTIFACT_DIR")
+TOKENIZER_OFFLINE = os.getenv("TOKENIZER_OFFLINE", "false").lower() == "true"
+
+# Response cache
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "false").lower() == "true"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# Trigram Jaccard threshold for near-identical prompts, 0 disables it
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+RESPONSE_CACHE_REPLAY_CHUNK = int(os.getenv("RESPONSE_CACHE_REPLAY_CHUNK", "32"))
+
+# Session titles: "llm", "batch" (one upstream call per interval) or "extractive"
+TITLE_GENERATOR = os.getenv("TITLE_GENERATOR", "llm")
+# Small model used for titles, empty to reuse the chat model
+TITLE_MODEL = os.getenv("TITLE_MODEL", "typhoon-v2-8b-instruct") or None
+TITLE_MAX_TOKENS = int(os.getenv("TITLE_MAX_TOKENS", "32"))
+TITLE_MAX_WORDS = int(os.getenv("TITLE_MAX_WORDS", "5"))
+TITLE_INPUT_CHARS = int(os.getenv("TITLE_INPUT_CHARS", "500"))
+TITLE_BATCH_INTERVAL = float(os.getenv("TITLE_BATCH_INTERVAL", "2.0"))
+TITLE_BATCH_SIZE = int(os.getenv("TITLE_BATCH_SIZE", "32"))
+
+# Context window
+CONTEXT_DEFAULT_LENGTH = int(os.getenv("CONTEXT_DEFAULT_LENGTH", "8192"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "256"))
+CONTEXT_TOKEN_CACHE_SIZE = int(os.getenv("CONTEXT_TOKEN_CACHE_SIZE", "100000"))
+CONTEXT_SUMMARY_SESSIONS = int(os.getenv("CONTEXT_SUMMARY_SESSIONS", "1000"))
 
 # System Prompt
 GET_SESSION_NAME_PROMPT = SystemMessage(
     content="สรุปเนื้อหาของข้อความที่ได้รับ ให้เป็นหัวข้อของการสนทนาสั้นกระชับ ไม่เกิน 5 คำ",
 )
 
+GET_SESSION_NAMES_PROMPT = SystemMessage(
+    content="สรุปหัวข้อของแต่ละข้อความที่มีหมายเลขกำกับ ให้สั้นกระชับ ไม่เกิน 5 คำ ตอบเป็น JSON array ของหัวข้อเรียงตามหมายเลขเท่านั้น",
+)
+
 GENERAL_PROMPT = SystemMessage(
     content="ตอบข้อความจากบทสนทนาที่ได้รับ โดยให้ตอบเป็นภาษาไทยหรืออังกฤษขึ้นอยู่กับภาษาที่ผู้ใช้งานถาม",
 )
+
+CONTEXT_SUMMARY_PROMPT = SystemMessage(
+    content="สรุปบทสนทนาที่ได้รับให้กระชับ โดยเก็บข้อเท็จจริง ชื่อ ตัวเลข และสิ่งที่ผู้ใช้งานต้องการไว้ให้ครบ",
+)
+
+CONTEXT_SUMMARY_HEADER = "สรุปบทสนทนาก่อนหน้า:\n"
@@ -0,0 +1,171 @@
+import time
+import asyncio
+import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+
+from src.io import messages as messages_io
+from src.io.history import history_cache
+from src.io.postgresql import async_session
+from src.io.writebehind import message_writer
+from src.metrics import answer_writes
+from src.models import RoleEnum
+
+
+class AnswerRecorder:  # pylint: disable=too-many-instance-attributes
+    """Persists a bot answer while it streams, so the client never re-sends it.
+
+    The row (or, for a regenerated answer, a new version of the message) is
+    created by the first flush and only the new text is appended after that.
+    Flushes run at most once per ``flush_interval`` seconds, one at a time and
+    off the stream's own task. ``finish`` writes the full text and token
+    counts once; an answer shorter than the interval is a single INSERT.
+    """
+
+    def __init__(
+        self,
+        email: str,
+        session_id: int | None,
+        message_id: int | None,
+        flush_interval: float,
+    ):
+        self.email = email
+        self.session_id = session_id
+        # Given for a regenerated answer, which becomes a new version of it
+        self.message_id = message_id
+        self.flush_interval = flush_interval
+        # Characters of the answer already in the row
+        self.written = 0
+        self._new_version = message_id is not None
+        self._last_flush = time.monotonic()
+        self._flush: asyncio.Task | None = None
+        self._final: asyncio.Task | None = None
+
+    def due(self) -> bool:
+        return (
+            self.flush_interval > 0
+            and time.monotonic() - self._last_flush >= self.flush_interval
+            and (self._flush is None or self._flush.done())
+        )
+
+    def flush(self, answer: str):
+        """Starts writing what is new in ``answer``, without waiting for it."""
+        self._last_flush = time.monotonic()
+        if len(answer) > self.written and self._final is None:
+            self._flush = asyncio.get_running_loop().create_task(self._append(answer))
+
+    async def _create(
+        self, session: AsyncSession, answer: str, tokens: int, token_speed: float
+    ) -> messages_io.RegisteredMessage:
+        kwargs = {
+            "email": self.email,
+            "message": answer,
+            "tokens": tokens,
+            "token_speed": token_speed,
+            "role": RoleEnum.BOT,
+            "record_datetime": datetime.datetime.now(datetime.timezone.utc),
+        }
+        if self.message_id is not None:
+            await message_writer.wait_for(self.message_id)
+            registered = await messages_io.register_message(
+                session, message_id=self.message_id, **kwargs
+            )
+        elif message_writer.running:
+            registered = await message_writer.register(
+                session, session_id=self.session_id, **kwargs
+            )
+        else:
+            registered = await messages_io.register_message(
+                session, session_id=self.session_id, **kwargs
+            )
+        if registered.message_id is not None:
+            self.message_id = registered.message_id
+            self._new_version = False
+        return registered
+
+    async def _append(self, answer: str):
+        try:
+            async with async_session() as session:
+                if self.message_id is None or self._new_version:
+                    registered = await self._create(session, answer, 0, 0.0)
+                    if registered.message_id is None:
+                        raise LookupError(
+                            f"Message {self.message_id} not found"
+                            if self.message_id is not None
+                            else f"Chat session {self.session_id} not found"
+                        )
+                else:
+                    await message_writer.wait_for(self.message_id)
+                    appended = await messages_io.append_message(
+                        session,
+                        self.email,
+                        self.message_id,
+                        answer[self.written :],
+                    )
+                    if appended is None:
+                        raise LookupError(f"Message {self.message_id} not found")
+            self.written = len(answer)
+            answer_writes.labels("append").inc()
+        except LookupError as exc:
+            # Nothing to append to, leave it to the final write
+            self.flush_interval = 0
+            logger.warning(f"Stopped persisting the answer as it streams: {exc}")
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            # The final write still persists the whole answer
+            logger.warning(f"Failed to persist the answer so far: {exc}")
+
+    async def _write_final(
+        self, answer: str, tokens: int, token_speed: float
+    ) -> int | None:
+        if self._flush is not None:
+            await self._flush
+        try:
+            async with async_session() as session:
+                if self.message_id is None or self._new_version:
+                    registered = await self._create(
+                        session, answer, tokens, token_speed
+                    )
+                    session_id = registered.session_id
+                else:
+                    await message_writer.wait_for(self.message_id)
+                    # Compacts the appended parts into the version's final text
+                    session_id = await messages_io.append_message(
+                        session,
+                        self.email,
+                        self.message_id,
+                        answer,
+                        replace=True,
+                        tokens=tokens,
+                        token_speed=token_speed,
+                    )
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.warning(f"Failed to persist the answer: {exc}")
+            return None
+        answer_writes.labels("final").inc()
+        if session_id is None or self._new_version or self.message_id is None:
+            logger.warning("Answer not persisted, its session or message is gone")
+            return None
+
+        # A transcript loaded mid-stream already holds the partial row
+        if not history_cache.update(session_id, self.message_id, answer, tokens):
+            history_cache.append(
+                session_id, self.message_id, RoleEnum.BOT, answer, tokens
+            )
+        return self.message_id
+
+    async def finish(self, answer: str, tokens: int, token_speed: float) -> int | None:
+        """Writes the final answer once and returns its message id.
+
+        The write is shielded from a client leaving halfway through it; a
+        later call, e.g. for the delivered part of a cut-off answer, joins
+        the write already running. An empty regenerated answer is not
+        written, it would supersede the current version with nothing.
+        """
+        if self._final is None and not answer and self._new_version:
+            return None
+        if self._final is None:
+            self._final = asyncio.get_running_loop().create_task(
+                self._write_final(answer, tokens, token_speed)
+            )
+        return await asyncio.shield(self._final)
@@ -0,0 +1,154 @@
+import json
+import asyncio
+import hashlib
+from collections.abc import Callable
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from loguru import logger
+
+from src.io.postgresql import async_session, engine
+from src.models import LLM, LLMSchema
+from src import config
+
+# Cheap content fingerprint of the table, compared when polling for changes
+VERSION_QUERY = text(
+    "SELECT md5(coalesce(string_agg(l::text, ',' ORDER BY id), '')) FROM llms l"
+)
+# Longest wait between attempts to LISTEN again while polling
+LISTEN_RETRY_MAX = 300.0
+
+
+class LLMCatalog:  # pylint: disable=too-many-instance-attributes
+    """In-process copy of the ``llms`` table, served without touching the database.
+
+    A trigger on ``llms`` sends NOTIFY on every change; each worker LISTENs on
+    a dedicated connection and reloads. When LISTEN is not available the
+    catalog polls a content hash of the table instead, and tries to LISTEN
+    again with a growing backoff.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        db_engine: AsyncEngine,
+        channel: str,
+        poll_interval: float,
+    ):
+        self.session_factory = session_factory
+        self.engine = db_engine
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self.llms: list[dict] = []
+        self.etag: str | None = None
+        self.reloads = 0
+        self._subscribers: list[Callable[[list[dict]], None]] = []
+        self._listener: asyncpg.Connection | None = None
+        self._task: asyncio.Task | None = None
+        self._reloading: set[asyncio.Task] = set()
+
+    def subscribe(self, callback: Callable[[list[dict]], None]):
+        self._subscribers.append(callback)
+
+    async def load(self):
+        async with self.session_factory() as session, session.begin():
+            result = await session.execute(select(LLM).order_by(LLM.id))
+            llms = [
+                LLMSchema.model_validate(llm, from_attributes=True).model_dump(
+                    mode="json"
+                )
+                for llm in result.scalars().all()
+            ]
+
+        body = json.dumps(llms, sort_keys=True, ensure_ascii=False).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if etag == self.etag:
+            return
+        self.llms, self.etag = llms, etag
+        self.reloads += 1
+        logger.info(f"Loaded {len(llms)} llms into the catalog (etag {etag})")
+        for callback in self._subscribers:
+            callback(llms)
+
+    async def _reload(self):
+        try:
+            await self.load()
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.warning(f"Failed to reload the llm catalog: {exc}")
+
+    def _on_notify(self, *_):
+        task = asyncio.get_running_loop().create_task(self._reload())
+        self._reloading.add(task)
+        task.add_done_callback(self._reloading.discard)
+
+    def _on_listener_lost(self, *_):
+        logger.warning("Lost the llm catalog listener, polling until it is back")
+        self._listener = None
+        self._task = asyncio.get_running_loop().create_task(self._poll())
+
+    async def _listen(self) -> bool:
+        url = self.engine.url.set(drivername="postgresql")
+        try:
+            self._listener = await asyncpg.connect(
+                url.render_as_string(hide_password=False)
+            )
+            await self._listener.add_listener(self.channel, self._on_notify)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.warning(f"Cannot LISTEN on {self.channel}: {exc}")
+            self._listener = None
+            return False
+        self._listener.add_termination_listener(self._on_listener_lost)
+        return True
+
+    async def _poll(self):
+        loop = asyncio.get_running_loop()
+        backoff = self.poll_interval
+        retry_at = loop.time() + backoff
+        # The first pass loads, changes made while nobody listened are not lost
+        version = None
+        while True:
+            try:
+                async with self.session_factory() as session, session.begin():
+                    current = (await session.execute(VERSION_QUERY)).scalar()
+                if current != version:
+                    await self.load()
+                version = current
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                logger.warning(f"Failed to poll the llm catalog: {exc}")
+            await asyncio.sleep(self.poll_interval)
+
+            if loop.time() < retry_at:
+                continue
+            if await self._listen():
+                logger.info("Listening for llm catalog changes again, stopped polling")
+                # Changes since the last poll came before the LISTEN
+                await self._reload()
+                return
+            backoff = min(backoff * 2, LISTEN_RETRY_MAX)
+            retry_at = loop.time() + backoff
+
+    async def start(self):
+        # Listen before the first load so no change can slip in between
+        listening = await self._listen()
+        await self.load()
+        if not listening:
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+
+    async def stop(self):
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            listener.remove_termination_listener(self._on_listener_lost)
+            await listener.close()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+llm_catalog = LLMCatalog(
+    async_session,
+    engine,
+    channel=config.CATALOG_NOTIFY_CHANNEL,
+    poll_interval=config.CATALOG_POLL_INTERVAL,
+)
@@ -0,0 +1,154 @@
+import asyncio
+from collections import OrderedDict
+from typing import NamedTuple
+
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from loguru import logger
+
+from src.io.partitions import since_session_start
+from src.io.postgresql import async_session
+from src.io.writebehind import message_writer
+from src.models import ChatSession, Message, MessageVersion, RoleEnum
+from src import config
+
+
+class Turn(NamedTuple):
+    # None for turns the client sent that are not registered yet
+    message_id: int | None
+    role: RoleEnum | None
+    content: str
+    # total_tokens of the current version, 0 when the client did not report a count
+    tokens: int = 0
+
+
+class HistoryCache:
+    """Per-session transcripts kept in memory and loaded from ``messages`` on a miss.
+
+    The register endpoint feeds every new or re-recorded message through
+    ``append``/``update`` so cached transcripts never need to be re-read. Writes
+    served by other workers are not seen, with ``max_sessions`` 0 every
+    transcript is read from the database.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, max_sessions: int):
+        self.session_factory = session_factory
+        self.max_sessions = max_sessions
+        self.hits = 0
+        self.misses = 0
+        self._sessions: OrderedDict[int, list[Turn]] = OrderedDict()
+        # Turns registered while a transcript is being read from the database
+        self._loading: dict[int, list[Turn]] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    async def _load(self, session_id: int) -> list[Turn]:
+        # This session's rows still queued by the write-behind writer must be
+        # visible to the read
+        await message_writer.wait_for_session(session_id)
+        async with self.session_factory() as session, session.begin():
+            result = await session.execute(
+                select(
+                    Message.id,
+                    Message.role,
+                    MessageVersion.message,
+                    MessageVersion.total_tokens,
+                )
+                .join(MessageVersion, MessageVersion.id == Message.current_version_id)
+                .where(
+                    Message.chat_session_id == session_id,
+                    since_session_start(
+                        select(ChatSession.created_at)
+                        .where(ChatSession.id == session_id)
+                        .scalar_subquery()
+                    ),
+                )
+                .order_by(Message.created_at, Message.id)
+            )
+            return [Turn(*row) for row in result]
+
+    def _store(self, session_id: int, turns: list[Turn]):
+        self._sessions[session_id] = turns
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def get(self, session_id: int) -> list[Turn]:
+        if self.max_sessions <= 0:
+            self.misses += 1
+            return await self._load(session_id)
+
+        turns = self._sessions.get(session_id)
+        if turns is not None:
+            self.hits += 1
+            self._sessions.move_to_end(session_id)
+            return list(turns)
+
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            # Another request may have loaded it while we waited
+            if session_id in self._sessions:
+                return await self.get(session_id)
+            self.misses += 1
+            self._loading[session_id] = []
+            try:
+                turns = await self._load(session_id)
+                positions = {turn.message_id: idx for idx, turn in enumerate(turns)}
+                for turn in self._loading[session_id]:
+                    if turn.message_id in positions:
+                        idx = positions[turn.message_id]
+                        turns[idx] = turns[idx]._replace(
+                            content=turn.content, tokens=turn.tokens
+                        )
+                    elif turn.role is not None:
+                        positions[turn.message_id] = len(turns)
+                        turns.append(turn)
+            finally:
+                self._loading.pop(session_id, None)
+                self._locks.pop(session_id, None)
+            logger.debug(f"Loaded {len(turns)} turns for session {session_id}")
+            self._store(session_id, turns)
+            return list(turns)
+
+    def append(
+        self,
+        session_id: int,
+        message_id: int,
+        role: RoleEnum,
+        content: str,
+        tokens: int = 0,
+        new_session: bool = False,
+    ):
+        turn = Turn(message_id, role, content, tokens)
+        if new_session and self.max_sessions > 0:
+            self._store(session_id, [turn])
+        elif session_id in self._sessions:
+            self._sessions[session_id].append(turn)
+        elif session_id in self._loading:
+            self._loading[session_id].append(turn)
+
+    def update(
+        self, session_id: int, message_id: int, content: str, tokens: int = 0
+    ) -> bool:
+        """Replaces a cached turn, returns whether the cached transcript had it."""
+        if session_id in self._loading:
+            # Applied on top of the rows once the load finishes
+            self._loading[session_id].append(Turn(message_id, None, content, tokens))
+        turns = self._sessions.get(session_id)
+        if turns is None:
+            return False
+        for idx, turn in enumerate(turns):
+            if turn.message_id == message_id:
+                turns[idx] = turn._replace(content=content, tokens=tokens)
+                return True
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+history_cache = HistoryCache(async_session, max_sessions=config.HISTORY_CACHE_SESSIONS)
@@ -0,0 +1,114 @@
+import time
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable, Hashable
+
+from loguru import logger
+
+from src import config
+
+
+class JobPool:  # pylint: disable=too-many-instance-attributes
+    """Bounded pool of asyncio workers for fire-and-forget jobs.
+
+    Jobs carry a key; submitting a key that is already queued or running is a
+    no-op. Failed jobs are retried with exponential backoff, and a full queue
+    sheds new jobs instead of growing without bound.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        max_retries: int,
+        retry_delay: float,
+    ):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.counters = dict.fromkeys(
+            ("submitted", "completed", "failed", "retried", "deduplicated", "dropped"),
+            0,
+        )
+        self.latencies: deque[float] = deque(maxlen=1000)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._keys: set[Hashable] = set()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._tasks = [
+            loop.create_task(self._worker(), name=f"job-worker-{idx}")
+            for idx in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} background job workers")
+
+    def submit(self, key: Hashable, job: Callable[..., Awaitable], *args) -> bool:
+        if key in self._keys:
+            self.counters["deduplicated"] += 1
+            return False
+        try:
+            self._queue.put_nowait((key, job, args, time.monotonic()))
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+            logger.warning(f"Background job queue full, dropping {key}")
+            return False
+        self._keys.add(key)
+        self.counters["submitted"] += 1
+        return True
+
+    async def _run(self, key: Hashable, job: Callable[..., Awaitable], args: tuple):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await job(*args)
+                self.counters["completed"] += 1
+                return
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                if attempt == self.max_retries:
+                    self.counters["failed"] += 1
+                    logger.error(f"Background job {key} failed: {exc}")
+                    return
+                self.counters["retried"] += 1
+                logger.warning(f"Background job {key} failed, retrying: {exc}")
+                await asyncio.sleep(self.retry_delay * 2**attempt)
+
+    async def _worker(self):
+        while True:
+            key, job, args, queued_at = await self._queue.get()
+            try:
+                await self._run(key, job, args)
+            finally:
+                self._keys.discard(key)
+                self.latencies.append(time.monotonic() - queued_at)
+                self._queue.task_done()
+
+    async def stop(self, timeout: float):
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} unfinished background jobs")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            **self.counters,
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "in_flight": len(self._keys) - self._queue.qsize(),
+            "latency_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+
+job_pool = JobPool(
+    workers=config.JOB_WORKERS,
+    max_queue=config.JOB_MAX_QUEUE,
+    max_retries=config.JOB_MAX_RETRIES,
+    retry_delay=config.JOB_RETRY_DELAY,
+)
@@ -0,0 +1,256 @@
+import datetime
+from typing import NamedTuple
+
+from sqlalchemy import func, insert, literal, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import (
+    User,
+    ChatSession,
+    Message,
+    MessageVersion,
+    PreferenceEnum,
+    RoleEnum,
+)
+
+NEW_SESSION_SUBJECT = "New chat session"
+VERSION_ID_SEQUENCE = f"{MessageVersion.__tablename__}_id_seq"
+
+
+class RegisteredMessage(NamedTuple):
+    user_id: int | None
+    session_id: int | None
+    message_id: int | None
+    new_session: bool
+
+
+def _typed(value, column):
+    return literal(value, column.type)
+
+
+def build_register_statement(
+    email: str,
+    message: str,
+    tokens: int,
+    token_speed: float,
+    role: RoleEnum,
+    record_datetime: datetime.datetime,
+    session_id: int | None = None,
+    message_id: int | None = None,
+):
+    """Resolve the user and session and write the message in one statement.
+
+    Every branch returns ``(user_id, session_id, message_id)`` so callers can
+    tell a missing user apart from a missing session or message. Re-recording
+    a message adds a version and moves the message's pointer to it, the text
+    of the earlier version stays as it was.
+    """
+    user = select(User.id).where(User.email == email).cte("u")
+
+    if message_id:
+        owned = select(ChatSession.id).where(
+            ChatSession.user_id == select(user.c.id).scalar_subquery()
+        )
+        superseded = (
+            update(MessageVersion)
+            .where(
+                MessageVersion.id == Message.current_version_id,
+                Message.id == message_id,
+                Message.chat_session_id.in_(owned),
+            )
+            .values(superseded_at=record_datetime)
+            .returning(MessageVersion.message_id, MessageVersion.version)
+            .cte("old")
+        )
+        version = (
+            insert(MessageVersion)
+            .from_select(
+                [
+                    "message_id",
+                    "version",
+                    "message",
+                    "total_tokens",
+                    "token_speed",
+                    "preference",
+                    "created_at",
+                ],
+                select(
+                    superseded.c.message_id,
+                    superseded.c.version + 1,
+                    _typed(message, MessageVersion.message),
+                    _typed(tokens, MessageVersion.total_tokens),
+                    _typed(str(token_speed), MessageVersion.token_speed),
+                    _typed(PreferenceEnum.NA, MessageVersion.preference),
+                    _typed(record_datetime, MessageVersion.created_at),
+                ),
+            )
+            .returning(MessageVersion.id, MessageVersion.message_id)
+            .cte("v")
+        )
+        updated = (
+            update(Message)
+            .where(Message.id == version.c.message_id)
+            .values(current_version_id=version.c.id, updated_at=record_datetime)
+            .returning(Message.id, Message.chat_session_id)
+            .cte("m")
+        )
+        return select(
+            select(user.c.id).scalar_subquery().label("user_id"),
+            updated.c.chat_session_id.label("session_id"),
+            updated.c.id.label("message_id"),
+        ).select_from(select(literal(1)).subquery().outerjoin(updated, true()))
+
+    if session_id:
+        chat_session = (
+            select(ChatSession.id)
+            .join(user, ChatSession.user_id == user.c.id)
+            .where(ChatSession.id == session_id)
+            .cte("s")
+        )
+    else:
+        chat_session = (
+            insert(ChatSession)
+            .from_select(
+                ["user_id", "subject", "created_at", "updated_at"],
+                select(
+                    user.c.id,
+                    _typed(NEW_SESSION_SUBJECT, ChatSession.subject),
+                    _typed(record_datetime, ChatSession.created_at),
+                    _typed(record_datetime, ChatSession.updated_at),
+                ),
+            )
+            .returning(ChatSession.id)
+            .cte("s")
+        )
+
+    # The version id is drawn up front so the message can point at it
+    inserted = (
+        insert(Message)
+        .from_select(
+            [
+                "chat_session_id",
+                "role",
+                "current_version_id",
+                "created_at",
+                "updated_at",
+            ],
+            select(
+                chat_session.c.id,
+                _typed(role, Message.role),
+                func.nextval(VERSION_ID_SEQUENCE),
+                _typed(record_datetime, Message.created_at),
+                _typed(record_datetime, Message.updated_at),
+            ),
+        )
+        .returning(Message.id, Message.current_version_id)
+        .cte("m")
+    )
+    version = (
+        insert(MessageVersion)
+        .from_select(
+            [
+                "id",
+                "message_id",
+                "version",
+                "message",
+                "total_tokens",
+                "token_speed",
+                "preference",
+                "created_at",
+            ],
+            select(
+                inserted.c.current_version_id,
+                inserted.c.id,
+                _typed(1, MessageVersion.version),
+                _typed(message, MessageVersion.message),
+                _typed(tokens, MessageVersion.total_tokens),
+                _typed(str(token_speed), MessageVersion.token_speed),
+                _typed(PreferenceEnum.NA, MessageVersion.preference),
+                _typed(record_datetime, MessageVersion.created_at),
+            ),
+        )
+        .returning(MessageVersion.message_id)
+        .cte("v")
+    )
+    return select(
+        select(user.c.id).scalar_subquery().label("user_id"),
+        select(chat_session.c.id).scalar_subquery().label("session_id"),
+        select(version.c.message_id).scalar_subquery().label("message_id"),
+    )
+
+
+async def register_message(
+    session: AsyncSession,
+    email: str,
+    message: str,
+    tokens: int,
+    token_speed: float,
+    role: RoleEnum,
+    record_datetime: datetime.datetime,
+    session_id: int | None = None,
+    message_id: int | None = None,
+) -> RegisteredMessage:
+    statement = build_register_statement(
+        email,
+        message,
+        tokens,
+        token_speed,
+        role,
+        record_datetime,
+        session_id=session_id,
+        message_id=message_id,
+    )
+    async with session.begin():
+        # A single statement is atomic on its own, skip the BEGIN/COMMIT round trips
+        await session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+        row = (await session.execute(statement)).one()
+    return RegisteredMessage(
+        user_id=row.user_id,
+        session_id=row.session_id,
+        message_id=row.message_id,
+        new_session=not (session_id or message_id) and row.session_id is not None,
+    )
+
+
+async def append_message(
+    session: AsyncSession,
+    email: str,
+    message_id: int,
+    text: str,
+    replace: bool = False,
+    tokens: int | None = None,
+    token_speed: float | None = None,
+) -> int | None:
+    """Append ``text`` to the current version of one of the user's messages.
+
+    Only the new text is sent, the concatenation happens in the database.
+    With ``replace`` the version's text is overwritten instead, e.g. by the
+    final text of an answer that was appended while it streamed. Returns the
+    message's session id, or None when the user has no such message.
+    """
+    owned = (
+        select(ChatSession.id)
+        .join(User, ChatSession.user_id == User.id)
+        .where(User.email == email)
+    )
+    values = {
+        "message": text if replace else MessageVersion.message.concat(text),
+    }
+    if tokens is not None:
+        values["total_tokens"] = tokens
+    if token_speed is not None:
+        values["token_speed"] = str(token_speed)
+    # On the table, an ORM UPDATE only returns columns of the updated entity
+    statement = (
+        update(MessageVersion.__table__)
+        .where(
+            MessageVersion.id == Message.current_version_id,
+            Message.id == message_id,
+            Message.chat_session_id.in_(owned),
+        )
+        .values(values)
+        .returning(Message.chat_session_id)
+    )
+    async with session.begin():
+        await session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+        return (await session.execute(statement)).scalar_one_or_none()
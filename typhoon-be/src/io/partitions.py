@@ -0,0 +1,250 @@
+"""Monthly range partitions of ``messages``, created ahead and retired behind.
+
+Rows written before their month's partition exists land in
+``messages_default`` and move into it once it is created. Run on every
+deploy, and from cron so partitions stay ahead of the clock:
+
+    uv run python -m src.io.partitions --ahead 3
+    uv run python -m src.io.partitions --retain 12 --archive
+
+Retired partitions are dropped together with the versions of their
+messages, or moved to the archive schema with ``--archive``. The legacy
+partition holding every row from before partitioning is never retired,
+it spans all of that history and is left to be archived by hand.
+"""
+
+import re
+import asyncio
+import argparse
+import datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from loguru import logger
+
+from src import config
+from src.io.postgresql import engine
+from src.models import Message, MessageVersion
+
+PARENT = Message.__tablename__
+DEFAULT_PARTITION = f"{PARENT}_default"
+LEGACY_PARTITION = f"{PARENT}_legacy"
+ARCHIVE_SCHEMA = "archive"
+# Sessions and their messages are stamped by different workers' clocks
+CLOCK_SLACK = datetime.timedelta(minutes=5)
+
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def since_session_start(session_created_at):
+    """Bounds ``messages.created_at`` below by the session's creation.
+
+    A session has no messages older than itself, with this the planner skips
+    every partition before it, at run time for a subquery or a lateral join.
+    """
+    return Message.created_at >= session_created_at - CLOCK_SLACK
+
+
+def add_months(month: datetime.datetime, months: int) -> datetime.datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def month_start(moment: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(moment.year, moment.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def partition_name(month: datetime.datetime) -> str:
+    return f"{PARENT}_y{month.year}m{month.month:02d}"
+
+
+async def partitions(conn: AsyncConnection) -> dict[str, datetime.datetime | None]:
+    """Attached partitions by name and their exclusive upper bound.
+
+    The bound is None for the default partition.
+    """
+    result = await conn.execute(
+        text(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = CAST(:parent AS regclass)
+            """
+        ),
+        {"parent": PARENT},
+    )
+    bounds = {}
+    for name, bound in result:
+        match = _UPPER_BOUND.search(bound)
+        bounds[name] = datetime.datetime.fromisoformat(match[1]) if match else None
+    return bounds
+
+
+async def create_partition(conn: AsyncConnection, month: datetime.datetime) -> int:
+    """Creates the partition of one month, returns the rows moved into it."""
+    name = partition_name(month)
+    upper = add_months(month, 1)
+    await conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)"))
+    # The default partition may not keep rows of a range that gets a partition
+    moved = await conn.execute(
+        text(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE created_at >= :lower AND created_at < :upper
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """
+        ),
+        {"lower": month, "upper": upper},
+    )
+    await conn.execute(
+        text(
+            f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+    )
+    return moved.rowcount
+
+
+async def drop_foreign_keys(conn: AsyncConnection, name: str):
+    foreign_keys = await conn.execute(
+        text(
+            """
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = CAST(:name AS regclass) AND contype = 'f'
+            """
+        ),
+        {"name": name},
+    )
+    for (constraint,) in foreign_keys.all():
+        await conn.execute(text(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"'))
+
+
+async def drop_partition(conn: AsyncConnection, name: str):
+    """Drops a detached partition and the versions of its messages."""
+    versions = MessageVersion.__tablename__
+    # Deleting versions would queue deferred checks of the partition's own
+    # foreign key, which must not outlive the table
+    await drop_foreign_keys(conn, name)
+    await conn.execute(
+        text(
+            f"""
+            DELETE FROM {versions} USING {name}
+            WHERE {versions}.message_id = {name}.id
+            """
+        )
+    )
+    await conn.execute(text(f"DROP TABLE {name}"))
+
+
+async def archive_partition(conn: AsyncConnection, name: str):
+    """Moves a detached partition and the versions of its messages to the archive."""
+    versions = MessageVersion.__tablename__
+    await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+    await conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.{versions} "
+            f"(LIKE {versions} INCLUDING DEFAULTS)"
+        )
+    )
+    # Archived rows may outlive the sessions and versions they pointed at
+    await drop_foreign_keys(conn, name)
+    await conn.execute(
+        text(
+            f"""
+            WITH moved AS (
+                DELETE FROM {versions} USING {name}
+                WHERE {versions}.message_id = {name}.id
+                RETURNING {versions}.*
+            )
+            INSERT INTO {ARCHIVE_SCHEMA}.{versions} SELECT * FROM moved
+            """
+        )
+    )
+    await conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+
+
+async def maintain(ahead: int, retain: int, archive: bool):
+    """Creates partitions for this month and the ``ahead`` months after it and,
+    with ``retain``, retires those that end more than ``retain`` months before
+    this one.
+
+    Each partition is handled in its own transaction, so locks on
+    ``messages`` are held for one partition at a time.
+    """
+    this_month = month_start(datetime.datetime.now(datetime.timezone.utc))
+    async with engine.connect() as conn:
+        # Bounds print in the session time zone, read them in UTC
+        await conn.execute(text("SET TimeZone = 'UTC'"))
+        await conn.commit()
+        bounds = await partitions(conn)
+        await conn.commit()
+
+        # Months missed while this did not run are filled in too
+        month = max(
+            (upper for upper in bounds.values() if upper is not None),
+            default=this_month,
+        )
+        while month <= add_months(this_month, ahead):
+            async with conn.begin():
+                moved = await create_partition(conn, month)
+            logger.info(f"Created {partition_name(month)}, moved {moved} rows into it")
+            month = add_months(month, 1)
+
+        if retain <= 0:
+            return
+        cutoff = add_months(this_month, -retain)
+        for name, upper in bounds.items():
+            if upper is None or upper > cutoff:
+                continue
+            if name == LEGACY_PARTITION:
+                logger.info(f"Keeping {name}, it is only ever retired by hand")
+                continue
+            # Versions go in the same transaction, none is left without its message
+            async with conn.begin():
+                await conn.execute(
+                    text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+                )
+                if archive:
+                    await archive_partition(conn, name)
+                else:
+                    await drop_partition(conn, name)
+            logger.info(f"{'Archived' if archive else 'Dropped'} {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--ahead",
+        type=int,
+        default=config.PARTITION_MONTHS_AHEAD,
+        help="months after this one to create partitions for, besides this one",
+    )
+    parser.add_argument(
+        "--retain",
+        type=int,
+        default=config.PARTITION_RETENTION_MONTHS,
+        help="months before this one to keep, older partitions are dropped, "
+        "0 keeps every partition",
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help=f"move retired partitions and their versions to the {ARCHIVE_SCHEMA} schema",
+    )
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            await maintain(args.ahead, args.retain, args.archive)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,32 @@
+import time
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src import config
+from src.metrics import db_pool_checkout_wait, db_pool_events
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Records how long each checkout waits for a connection.
+
+    Pool events only fire once a connection is in hand, the wait itself
+    happens in ``_do_get``.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - start)
+
 
 # Create a sessionmaker for async sessions
 engine = create_async_engine(
     config.DATABASE_URL,
+    poolclass=TimedQueuePool,
     pool_size=config.POOL_SIZE,
     max_overflow=config.MAX_OVERFLOW,
     pool_timeout=config.POOL_TIMEOUT,
@@ -12,6 +34,19 @@ engine = create_async_engine(
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
 
+def _count_event(name: str):
+    counter = db_pool_events.labels(name)
+
+    def listener(*_):
+        counter.inc()
+
+    return listener
+
+
+for _name in ("connect", "checkout", "checkin", "invalidate", "close"):
+    event.listen(engine.sync_engine.pool, _name, _count_event(_name))
+
+
 async def get_session() -> AsyncSession:  # type: ignore
     async with async_session() as session:
         yield session
@@ -0,0 +1,264 @@
+import asyncio
+import datetime
+from collections import OrderedDict, deque
+
+from sqlalchemy import func, insert
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from loguru import logger
+
+from src.io.messages import RegisteredMessage, VERSION_ID_SEQUENCE
+from src.io.postgresql import async_session
+from src.models import (
+    User,
+    ChatSession,
+    Message,
+    MessageVersion,
+    RoleEnum,
+    PreferenceEnum,
+)
+from src import config
+
+
+class IdAllocator:
+    """Hands out ids from blocks reserved on a table's sequence."""
+
+    def __init__(self, sequence: str, block_size: int):
+        self.sequence = sequence
+        self.block_size = block_size
+        self._ids: deque[int] = deque()
+        self._lock = asyncio.Lock()
+
+    async def next_id(self, session: AsyncSession) -> int:
+        async with self._lock:
+            if not self._ids:
+                result = await session.execute(
+                    select(func.nextval(self.sequence)).select_from(
+                        func.generate_series(1, self.block_size)
+                    )
+                )
+                self._ids.extend(result.scalars().all())
+            return self._ids.popleft()
+
+
+class MessageWriter:  # pylint: disable=too-many-instance-attributes
+    """Acknowledges messages immediately and persists them in batched INSERTs.
+
+    Rows are flushed once ``batch_size`` rows are queued or ``flush_interval``
+    seconds after the first queued row, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        batch_size: int,
+        flush_interval: float,
+        max_queue: int,
+        id_block_size: int,
+        known_sessions: int = 10_000,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.ids = IdAllocator(f"{Message.__tablename__}_id_seq", id_block_size)
+        self.version_ids = IdAllocator(VERSION_ID_SEQUENCE, id_block_size)
+        self.known_sessions = known_sessions
+        self.rows_written = 0
+        self.batches = 0
+        self.failures = 0
+        self._owners: OrderedDict[tuple[str, int], int] = OrderedDict()
+        # Set once the batch holding the message commits (or drops it)
+        self._pending: dict[int, asyncio.Event] = {}
+        self._pending_by_session: dict[int, set[int]] = {}
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Write-behind message writer started")
+
+    def remember_session(self, email: str, session_id: int, user_id: int):
+        self._owners[(email, session_id)] = user_id
+        self._owners.move_to_end((email, session_id))
+        while len(self._owners) > self.known_sessions:
+            self._owners.popitem(last=False)
+
+    async def _resolve_owner(self, session: AsyncSession, email: str, session_id: int):
+        user_id = self._owners.get((email, session_id))
+        if user_id is not None:
+            self._owners.move_to_end((email, session_id))
+            return user_id, session_id
+
+        result = await session.execute(
+            select(User.id, ChatSession.id)
+            .select_from(User)
+            .outerjoin(
+                ChatSession,
+                (ChatSession.user_id == User.id) & (ChatSession.id == session_id),
+            )
+            .where(User.email == email)
+        )
+        row = result.first()
+        if row is None:
+            return None, None
+        if row[1] is not None:
+            self.remember_session(email, session_id, row[0])
+        return row[0], row[1]
+
+    async def register(
+        self,
+        session: AsyncSession,
+        email: str,
+        message: str,
+        tokens: int,
+        token_speed: float,
+        role: RoleEnum,
+        record_datetime: datetime.datetime,
+        session_id: int,
+    ) -> RegisteredMessage:
+        async with session.begin():
+            user_id, session_id = await self._resolve_owner(session, email, session_id)
+            if session_id is None:
+                return RegisteredMessage(user_id, None, None, False)
+            message_id = await self.ids.next_id(session)
+            version_id = await self.version_ids.next_id(session)
+
+        self._pending[message_id] = asyncio.Event()
+        self._pending_by_session.setdefault(session_id, set()).add(message_id)
+        await self._queue.put(
+            (
+                {
+                    "id": message_id,
+                    "chat_session_id": session_id,
+                    "role": role,
+                    "current_version_id": version_id,
+                    "created_at": record_datetime,
+                    "updated_at": record_datetime,
+                },
+                {
+                    "id": version_id,
+                    "message_id": message_id,
+                    "version": 1,
+                    "message": message,
+                    "total_tokens": tokens,
+                    "token_speed": str(token_speed),
+                    "preference": PreferenceEnum.NA,
+                    "created_at": record_datetime,
+                },
+            )
+        )
+        return RegisteredMessage(user_id, session_id, message_id, False)
+
+    async def wait_for(self, message_id: int):
+        # Updates against a message that is still queued must see the row first
+        written = self._pending.get(message_id)
+        if written is not None:
+            await written.wait()
+
+    async def wait_for_session(self, session_id: int):
+        # Reads of a session must see its rows queued so far, not later ones
+        for message_id in list(self._pending_by_session.get(session_id, ())):
+            await self.wait_for(message_id)
+
+    def _settle(self, message: dict):
+        written = self._pending.pop(message["id"], None)
+        if written is not None:
+            written.set()
+        session_rows = self._pending_by_session.get(message["chat_session_id"])
+        if session_rows is not None:
+            session_rows.discard(message["id"])
+            if not session_rows:
+                del self._pending_by_session[message["chat_session_id"]]
+
+    async def _collect(self) -> list[tuple[dict, dict]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, 0.01))
+        return batch
+
+    async def _insert(self, batch: list[tuple[dict, dict]]):
+        # The version pointer is checked at commit, once both rows exist
+        async with self.session_factory() as session, session.begin():
+            await session.execute(insert(Message), [message for message, _ in batch])
+            await session.execute(
+                insert(MessageVersion), [version for _, version in batch]
+            )
+
+    async def _write(self, batch: list[tuple[dict, dict]]):
+        try:
+            await self._insert(batch)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            # One bad row (e.g. a session deleted meanwhile) must not drop the batch
+            logger.warning(f"Batch insert of {len(batch)} messages failed: {exc}")
+            for row in batch:
+                try:
+                    await self._insert([row])
+                except Exception as row_exc:  # pylint: disable=broad-exception-caught
+                    self.failures += 1
+                    logger.error(f"Dropping message {row[0]['id']}: {row_exc}")
+                else:
+                    self.rows_written += 1
+        else:
+            self.rows_written += len(batch)
+        self.batches += 1
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self._write(batch)
+            finally:
+                for message, _ in batch:
+                    self._settle(message)
+                    self._queue.task_done()
+
+    async def flush(self):
+        # Waits for an empty queue, only returns once traffic stops (shutdown)
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def drain(self):
+        if not self.running:
+            return
+        logger.info(f"Draining {self._queue.qsize()} queued messages")
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        logger.info("Write-behind message writer stopped")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "pending": len(self._pending),
+            "rows_written": self.rows_written,
+            "batches": self.batches,
+            "failures": self.failures,
+        }
+
+
+message_writer = MessageWriter(
+    async_session,
+    batch_size=config.WRITE_BEHIND_BATCH_SIZE,
+    flush_interval=config.WRITE_BEHIND_FLUSH_INTERVAL,
+    max_queue=config.WRITE_BEHIND_MAX_QUEUE,
+    id_block_size=config.WRITE_BEHIND_ID_BLOCK,
+)
@@ -0,0 +1,209 @@
+import math
+import time
+import asyncio
+from collections import Counter, deque
+from collections.abc import AsyncIterator
+
+from loguru import logger
+
+from src import config
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One chat stream, from admission until it is released."""
+
+    def __init__(self, user: str, deadline: float, future: asyncio.Future | None):
+        self.user = user
+        self.deadline = deadline
+        self.future = future
+        self.started: float | None = None
+        self.released = False
+
+    @property
+    def admitted(self) -> bool:
+        return self.started is not None
+
+
+class AdmissionController:  # pylint: disable=too-many-instance-attributes
+    """Admits chat streams under a global and a per-user concurrency limit.
+
+    A user over their limit, or anyone once the wait queue is full, is
+    rejected straight away; everyone else waits in FIFO order for a slot.
+    The global limit follows the upstream: it shrinks while the average
+    token_speed of finished streams is under ``target_token_speed`` and grows
+    back one slot at a time while streams are fast and the limit is reached.
+    """
+
+    def __init__(
+        self,
+        max_streams: int,
+        min_streams: int,
+        max_per_user: int,
+        max_queue: int,
+        queue_timeout: float,
+        deadline: float,
+        target_token_speed: float,
+    ):
+        self.max_streams = max_streams
+        self.min_streams = min(min_streams, max_streams)
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self.target_token_speed = target_token_speed
+        self.limit = max_streams
+        self.in_flight = 0
+        self.token_speed: float | None = None
+        self.duration: float | None = None
+        self.counters = dict.fromkeys(
+            ("admitted", "queued", "rejected", "timed_out", "expired"), 0
+        )
+        # Streams per user, in flight or queued
+        self._users: Counter[str] = Counter()
+        self._queue: deque[Ticket] = deque()
+        self._last_decrease = 0.0
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.duration or 1.0))
+
+    def _reject(self, reason: str):
+        self.counters["rejected"] += 1
+        raise AdmissionRejected(reason, self.retry_after)
+
+    def _start(self, ticket: Ticket):
+        ticket.started = time.monotonic()
+        self.in_flight += 1
+        self.counters["admitted"] += 1
+
+    def admit(self, user: str) -> Ticket:
+        if self._users[user] >= self.max_per_user:
+            self._reject(f"Too many concurrent chats, the limit is {self.max_per_user}")
+
+        deadline = time.monotonic() + self.deadline
+        if self.in_flight < self.limit and not self._queue:
+            ticket = Ticket(user, deadline, None)
+            self._start(ticket)
+        elif len(self._queue) < self.max_queue:
+            ticket = Ticket(user, deadline, asyncio.get_running_loop().create_future())
+            self._queue.append(ticket)
+            self.counters["queued"] += 1
+        else:
+            self._reject("The server is busy, try again shortly")
+        self._users[user] += 1
+        return ticket
+
+    async def wait(self, ticket: Ticket) -> AsyncIterator[int]:
+        """Yields the ticket's queue position whenever it moves, until admitted."""
+        timeout_at = time.monotonic() + self.queue_timeout
+        position = None
+        while not ticket.admitted:
+            current = self._queue.index(ticket) + 1
+            if current != position:
+                position = current
+                yield position
+            remaining = timeout_at - time.monotonic()
+            if remaining <= 0:
+                self.counters["timed_out"] += 1
+                self.release(ticket)
+                raise AdmissionRejected(
+                    "Timed out waiting for a free slot", self.retry_after
+                )
+            await asyncio.wait([ticket.future], timeout=min(1.0, remaining))
+
+    async def until_deadline(self, ticket: Ticket, chunks: AsyncIterator):
+        """Relays ``chunks``, raising TimeoutError once the ticket's deadline passes."""
+        try:
+            while True:
+                remaining = ticket.deadline - time.monotonic()
+                try:
+                    # Only the read is timed, a timeout scope must not span the yield
+                    async with asyncio.timeout(max(0.0, remaining)):
+                        chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    return
+                except TimeoutError:
+                    self.counters["expired"] += 1
+                    raise
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    def release(self, ticket: Ticket, token_speed: float | None = None):
+        if ticket.released:
+            return
+        ticket.released = True
+        self._users[ticket.user] -= 1
+        if self._users[ticket.user] <= 0:
+            del self._users[ticket.user]
+
+        if ticket.admitted:
+            self.in_flight -= 1
+            duration = time.monotonic() - ticket.started
+            self.duration = (
+                duration
+                if self.duration is None
+                else 0.8 * self.duration + 0.2 * duration
+            )
+            if token_speed is not None:
+                self._adapt(token_speed)
+        else:
+            self._queue.remove(ticket)
+        self._wake()
+
+    def _adapt(self, token_speed: float):
+        self.token_speed = (
+            token_speed
+            if self.token_speed is None
+            else 0.8 * self.token_speed + 0.2 * token_speed
+        )
+        if self.target_token_speed <= 0:
+            return
+
+        now = time.monotonic()
+        if self.token_speed < self.target_token_speed:
+            # Back off at most once a second, finished streams arrive in bursts
+            if self.limit > self.min_streams and now - self._last_decrease >= 1.0:
+                self.limit = max(self.min_streams, int(self.limit * 0.9))
+                self._last_decrease = now
+                logger.warning(
+                    f"Upstream at {self.token_speed:.1f} tokens/s, "
+                    f"lowering the stream limit to {self.limit}"
+                )
+        elif self.limit < self.max_streams and self.in_flight + 1 >= self.limit:
+            self.limit += 1
+
+    def _wake(self):
+        while self._queue and self.in_flight < self.limit:
+            ticket = self._queue.popleft()
+            self._start(ticket)
+            ticket.future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "limit": self.limit,
+            "max_streams": self.max_streams,
+            "in_flight": self.in_flight,
+            "queued_now": len(self._queue),
+            "users": len(self._users),
+            "token_speed": self.token_speed,
+        }
+
+
+admission = AdmissionController(
+    max_streams=config.ADMISSION_MAX_STREAMS,
+    min_streams=config.ADMISSION_MIN_STREAMS,
+    max_per_user=config.ADMISSION_MAX_PER_USER,
+    max_queue=config.ADMISSION_MAX_QUEUE,
+    queue_timeout=config.ADMISSION_QUEUE_TIMEOUT,
+    deadline=config.STREAM_DEADLINE,
+    target_token_speed=config.ADMISSION_TARGET_TOKEN_SPEED,
+)
@@ -1,14 +1,95 @@
-from functools import lru_cache
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from langchain_core.runnables import Runnable
 from langchain_openai import ChatOpenAI
 
+from src.llmlib.transport import http_client
 from src import config
 
+# Params that change how the client itself is built, everything else is a
+# per-call sampling param bound onto the shared client
+CLIENT_PARAMS = ("model", "timeout", "max_retries", "model_kwargs", "default_headers")
+
+
+def canonicalize(value: Any) -> Hashable:
+    """Turn nested params (lists, dicts, sets) into a stable hashable key."""
+    if isinstance(value, dict):
+        return tuple(
+            sorted((str(key), canonicalize(val)) for key, val in value.items())
+        )
+    if isinstance(value, (list, tuple)):
+        return tuple(canonicalize(val) for val in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(canonicalize(val) for val in value))
+    return value
+
+
+class ClientCache:
+    """LRU + TTL cache of LLM clients with hit/miss counters."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        self.misses += 1
+        value = factory()
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def clear(self):
+        self._entries.clear()
 
-@lru_cache(maxsize=128)
-def get_llm(**params) -> ChatOpenAI:
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+client_cache = ClientCache(config.LLM_CLIENT_CACHE_SIZE, config.LLM_CLIENT_CACHE_TTL)
+
+
+def _build_llm(endpoint: str, client_params: dict) -> ChatOpenAI:
     return ChatOpenAI(
-        base_url=config.LLM_ENDPOINT,
+        base_url=endpoint,
         api_key=config.API_KEY,
         streaming=True,
-        **params,
+        stream_usage=config.LLM_STREAM_USAGE,
+        http_async_client=http_client,
+        **client_params,
     )
+
+
+def get_llm(**params) -> Runnable:
+    endpoint = config.LLM_ENDPOINT
+    client_params = {key: params[key] for key in CLIENT_PARAMS if key in params}
+    call_params = {key: val for key, val in params.items() if key not in CLIENT_PARAMS}
+
+    key = (endpoint, canonicalize(client_params))
+    llm = client_cache.get(key, lambda: _build_llm(endpoint, client_params))
+
+    if call_params:
+        return llm.bind(**call_params)
+    return llm
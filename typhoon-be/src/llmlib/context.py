@@ -0,0 +1,248 @@
+from collections import OrderedDict
+from typing import NamedTuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from loguru import logger
+
+from src.io.history import Turn
+from src.io.jobs import job_pool
+from src.llmlib.chatopenai import get_llm
+from src.llmlib.tokencounter import token_lengths
+from src.models import RoleEnum
+from src import config
+
+# Chat template tokens wrapped around every message (role header, end of turn)
+MESSAGE_OVERHEAD = 5
+# Turns tokenized per executor call while walking back through the history
+COUNT_BATCH = 16
+
+
+class ChatModel(NamedTuple):
+    fullname: str
+    shortname: str
+    tokenizer: object
+
+
+class ModelWindow(NamedTuple):
+    context_length: int
+    default_output: int
+
+
+class Summary(NamedTuple):
+    upto_message_id: int
+    content: str
+    tokens: int
+
+
+def to_message(turn: Turn) -> BaseMessage:
+    if turn.role == RoleEnum.USER:
+        return HumanMessage(content=turn.content)
+    return AIMessage(content=turn.content)
+
+
+class ContextAssembler:  # pylint: disable=too-many-instance-attributes
+    """Fits a conversation into the model's context window.
+
+    The newest turns that fit the budget are sent verbatim. For stored sessions
+    the turns that fall out of the window are folded into a rolling summary,
+    refreshed by a background job and sent ahead of the window on later turns.
+    Token counts are memoized per message text, so each turn only tokenizes
+    what it has not seen before.
+    """
+
+    def __init__(
+        self,
+        default_context_length: int,
+        summary_tokens: int,
+        max_counts: int,
+        max_summaries: int,
+    ):
+        self.default_context_length = default_context_length
+        self.summary_tokens = summary_tokens
+        self.max_counts = max_counts
+        self.max_summaries = max_summaries
+        self.truncated = 0
+        self.summaries_built = 0
+        self._models: dict[str, ModelWindow] = {}
+        self._counts: OrderedDict[tuple[str, int], int] = OrderedDict()
+        self._summaries: OrderedDict[int, Summary] = OrderedDict()
+
+    def register_model(self, fullname: str, params: dict | None):
+        params = params or {}
+        self._models[fullname] = ModelWindow(
+            context_length=int(
+                params.get("contextLength", self.default_context_length)
+            ),
+            default_output=int(params.get("outputLength", {}).get("default", 0)),
+        )
+
+    def window(self, fullname: str) -> ModelWindow:
+        return self._models.get(fullname, ModelWindow(self.default_context_length, 0))
+
+    async def _count(self, model: ChatModel, texts: list[str]) -> list[int]:
+        keys = [(model.fullname, hash(text)) for text in texts]
+        counts: dict[int, int] = {}
+        for idx, key in enumerate(keys):
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                counts[idx] = self._counts[key]
+
+        missing = [idx for idx in range(len(texts)) if idx not in counts]
+        lengths = await token_lengths(model.tokenizer, [texts[idx] for idx in missing])
+        # Estimates from the approximate tokenizer are not worth keeping
+        memoize = getattr(model.tokenizer, "is_fast", False)
+        for idx, length in zip(missing, lengths):
+            counts[idx] = length
+            if memoize:
+                self._counts[keys[idx]] = length
+        while len(self._counts) > self.max_counts:
+            self._counts.popitem(last=False)
+        return [counts[idx] for idx in range(len(texts))]
+
+    async def _turn_tokens(self, model: ChatModel, turns: list[Turn]) -> list[int]:
+        # Reported counts (streamed answers) are reused, the rest is tokenized
+        unknown = [turn.content for turn in turns if not turn.tokens]
+        counted = iter(await self._count(model, unknown))
+        return [turn.tokens or next(counted) for turn in turns]
+
+    def _summary_start(self, session_id: int | None, turns: list[Turn]):
+        summary = self._summaries.get(session_id)
+        if summary is None:
+            return None, 0
+        for idx, turn in enumerate(turns):
+            if turn.message_id == summary.upto_message_id:
+                self._summaries.move_to_end(session_id)
+                # The newest turn is always sent verbatim
+                return summary, min(idx + 1, len(turns) - 1)
+        return None, 0
+
+    async def _fit(
+        self, model: ChatModel, turns: list[Turn], start: int, budget: int
+    ) -> int:
+        """Index of the oldest turn that fits, walking back from the newest one."""
+        first, used = len(turns), 0
+        while first > start:
+            batch = turns[max(start, first - COUNT_BATCH) : first]
+            for count in reversed(await self._turn_tokens(model, batch)):
+                if first < len(turns) and used + count + MESSAGE_OVERHEAD > budget:
+                    return first
+                used += count + MESSAGE_OVERHEAD
+                first -= 1
+        return first
+
+    async def assemble(
+        self,
+        turns: list[Turn],
+        system_prompt: SystemMessage,
+        model: ChatModel,
+        max_tokens: int | None = None,
+        session_id: int | None = None,
+    ) -> list[BaseMessage]:
+        window = self.window(model.fullname)
+        summary, start = self._summary_start(session_id, turns)
+
+        (system_tokens,) = await self._count(model, [system_prompt.content])
+        budget = (
+            window.context_length
+            - (max_tokens or window.default_output)
+            - system_tokens
+            - MESSAGE_OVERHEAD
+        )
+        if summary is not None:
+            budget -= summary.tokens + MESSAGE_OVERHEAD
+
+        first = await self._fit(model, turns, start, budget)
+        if first > start:
+            self.truncated += 1
+            logger.debug(
+                f"Context for {model.fullname} dropped {first - start} turns "
+                f"(budget {budget})"
+            )
+            if session_id is not None:
+                self._schedule_summary(session_id, model, summary, turns[start:first])
+
+        messages = [system_prompt]
+        if summary is not None:
+            messages.append(
+                SystemMessage(content=config.CONTEXT_SUMMARY_HEADER + summary.content)
+            )
+        return messages + [to_message(turn) for turn in turns[first:]]
+
+    def _schedule_summary(
+        self,
+        session_id: int,
+        model: ChatModel,
+        previous: Summary | None,
+        dropped: list[Turn],
+    ):
+        if dropped[-1].message_id is None:
+            return
+        # One summary per session at a time, retried and drained like titles
+        job_pool.submit(
+            ("context-summary", session_id),
+            self._summarize,
+            session_id,
+            model,
+            previous,
+            dropped,
+        )
+
+    async def _transcript(
+        self, model: ChatModel, previous: Summary | None, dropped: list[Turn]
+    ) -> str:
+        # Keep the summarizer's own input within half of the context window
+        limit = self.window(model.fullname).context_length // 2
+        keep, used = len(dropped), 0
+        counts = await self._turn_tokens(model, dropped)
+        while keep > 0 and used + counts[keep - 1] <= limit:
+            used += counts[keep - 1]
+            keep -= 1
+
+        lines = [f"{turn.role.value}: {turn.content}" for turn in dropped[keep:]]
+        if previous is not None:
+            lines.insert(0, previous.content)
+        return "\n".join(lines)
+
+    async def _summarize(
+        self,
+        session_id: int,
+        model: ChatModel,
+        previous: Summary | None,
+        dropped: list[Turn],
+    ):
+        transcript = await self._transcript(model, previous, dropped)
+        llm = get_llm(
+            model=model.shortname, max_tokens=self.summary_tokens, temperature=0
+        )
+        result = await llm.ainvoke(
+            [config.CONTEXT_SUMMARY_PROMPT, HumanMessage(content=transcript)]
+        )
+        usage = result.usage_metadata or {}
+        tokens = (
+            usage.get("output_tokens")
+            or (await self._count(model, [result.content]))[0]
+        )
+        self._summaries[session_id] = Summary(
+            dropped[-1].message_id, result.content, tokens
+        )
+        self._summaries.move_to_end(session_id)
+        while len(self._summaries) > self.max_summaries:
+            self._summaries.popitem(last=False)
+        self.summaries_built += 1
+        logger.debug(f"Summarized {len(dropped)} turns of session {session_id}")
+
+    def stats(self) -> dict:
+        return {
+            "truncated": self.truncated,
+            "summaries": len(self._summaries),
+            "summaries_built": self.summaries_built,
+            "token_counts_cached": len(self._counts),
+        }
+
+
+context_assembler = ContextAssembler(
+    default_context_length=config.CONTEXT_DEFAULT_LENGTH,
+    summary_tokens=config.CONTEXT_SUMMARY_TOKENS,
+    max_counts=config.CONTEXT_TOKEN_CACHE_SIZE,
+    max_summaries=config.CONTEXT_SUMMARY_SESSIONS,
+)
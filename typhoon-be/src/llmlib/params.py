@@ -0,0 +1,110 @@
+from typing import Any, NamedTuple
+
+
+class ParamKey(NamedTuple):
+    # Name in the OpenAI API, or in the provider's extension of it
+    name: str
+    cast: type
+    # Not an OpenAI param, sent through extra_body when the model declares it
+    extra: bool = False
+
+
+_CLIENT_KEYS = {
+    "temperature": ParamKey("temperature", float),
+    "topP": ParamKey("top_p", float),
+    "outputLength": ParamKey("max_tokens", int),
+    "maxTokens": ParamKey("max_tokens", int),
+    "presencePenalty": ParamKey("presence_penalty", float),
+    "frequencyPenalty": ParamKey("frequency_penalty", float),
+    "seed": ParamKey("seed", int),
+    # Stop sequences, kept as a tuple so params stay hashable
+    "stop": ParamKey("stop", tuple),
+    "topK": ParamKey("top_k", int, extra=True),
+    "repetitionPenalty": ParamKey("repetition_penalty", float, extra=True),
+    "minP": ParamKey("min_p", float, extra=True),
+}
+# Clients send camelCase, API callers may use the OpenAI names directly
+PARAM_KEYS = {**_CLIENT_KEYS, **{key.name: key for key in _CLIENT_KEYS.values()}}
+EXTRA_NAMES = frozenset(key.name for key in _CLIENT_KEYS.values() if key.extra)
+
+
+class ChatParams(NamedTuple):
+    """Validated sampling params of one request, hashable as a cache key."""
+
+    sampling: tuple[tuple[str, Any], ...] = ()
+    extra: tuple[tuple[str, Any], ...] = ()
+
+    def get(self, name: str, default: Any = None) -> Any:
+        for key, value in self.sampling + self.extra:
+            if key == name:
+                return value
+        return default
+
+    def kwargs(self) -> dict[str, Any]:
+        kwargs = {
+            key: list(value) if isinstance(value, tuple) else value
+            for key, value in self.sampling
+        }
+        if self.extra:
+            kwargs["extra_body"] = dict(self.extra)
+        return kwargs
+
+
+class ParamSchema:
+    """Sampling params a model accepts, compiled once from its ``llms.params``.
+
+    Entries like ``{"temperature": {"min": 0, "max": 2, "default": 0.7}}`` give
+    the limits values are clamped to and the defaults of params a request
+    leaves out. ``stop`` takes a string or a list of strings and is passed
+    through as is. OpenAI params are always accepted, provider extras such as
+    ``top_k`` only when the model declares them. Unknown keys are dropped.
+    """
+
+    def __init__(self, params: dict[str, Any]):
+        self.limits: dict[str, tuple[float | None, float | None]] = {}
+        self.declared: set[str] = set()
+        defaults = {}
+        for key, spec in params.items():
+            param = PARAM_KEYS.get(key)
+            if param is None or not isinstance(spec, dict):
+                continue
+            self.declared.add(param.name)
+            self.limits[param.name] = (spec.get("min"), spec.get("max"))
+            if "default" in spec:
+                defaults[key] = spec["default"]
+        self.defaults = self._values(defaults)
+
+    def _value(self, key: str, param: ParamKey, value: Any) -> Any:
+        if param.cast is tuple:
+            if isinstance(value, str):
+                value = [value]
+            if not isinstance(value, list) or not all(
+                isinstance(item, str) for item in value
+            ):
+                raise ValueError(f"{key} must be a string or a list of strings")
+            return tuple(value)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{key} must be a number")
+        low, high = self.limits.get(param.name, (None, None))
+        if low is not None:
+            value = max(value, low)
+        if high is not None:
+            value = min(value, high)
+        return param.cast(value)
+
+    def _values(self, params: dict[str, Any]) -> dict[str, Any]:
+        values = {}
+        for key, value in params.items():
+            param = PARAM_KEYS.get(key)
+            if param is None or (param.extra and param.name not in self.declared):
+                continue
+            values[param.name] = self._value(key, param, value)
+        return values
+
+    def compile(self, params: dict[str, Any]) -> ChatParams:
+        """Raises ValueError for a value of the wrong type."""
+        values = sorted({**self.defaults, **self._values(params)}.items())
+        return ChatParams(
+            tuple(item for item in values if item[0] not in EXTRA_NAMES),
+            tuple(item for item in values if item[0] in EXTRA_NAMES),
+        )
@@ -0,0 +1,68 @@
+from langchain_core.runnables import Runnable
+from loguru import logger
+
+from src.llmlib.chatopenai import get_llm
+from src.llmlib.context import ChatModel, context_assembler
+from src.llmlib.params import ChatParams, ParamSchema
+from src.llmlib.tokenizer import tokenizer_registry
+
+
+class RegisteredModel:
+    """One row of the ``llms`` table and what serving it needs."""
+
+    def __init__(self, llm: dict):
+        self.id = llm["id"]
+        self.shortname = llm["shortname"]
+        self.fullname = llm["fullname"]
+        self.params = llm["params"] or {}
+        self.schema = ParamSchema(self.params)
+
+    @property
+    def client(self) -> Runnable:
+        # Looked up in client_cache per use so its size and TTL apply; built on
+        # first use, a catalog reload must not fail on client settings
+        return get_llm(model=self.shortname)
+
+    @property
+    def tokenizer(self):
+        # Resolved per use, the tokenizer registry loads and evicts on its own
+        return tokenizer_registry.get(self.fullname)
+
+    def chat_model(self) -> ChatModel:
+        return ChatModel(self.fullname, self.shortname, self.tokenizer)
+
+    def llm(self, params: ChatParams) -> Runnable:
+        client = self.client
+        if not (params.sampling or params.extra):
+            return client
+        # Binding is cheap and shares the client, only real clients are cached
+        return client.bind(**params.kwargs())
+
+
+class ModelRegistry:
+    """The models requests may name, by ``llms.id``, rebuilt from the llm catalog.
+
+    Only models in the table get a tokenizer or a client, so a request naming
+    anything else is refused instead of triggering a load on the request path.
+    """
+
+    def __init__(self):
+        self._models: dict[int, RegisteredModel] = {}
+
+    def apply(self, llms: list[dict]):
+        models = {llm["id"]: RegisteredModel(llm) for llm in llms}
+        # Tokenizers load in the background, requests use the approximate counter until ready
+        for model in models.values():
+            tokenizer_registry.preload(model.fullname)
+            context_assembler.register_model(model.fullname, model.params)
+        self._models = models
+        logger.info(f"Registered {len(models)} models")
+
+    def get(self, model_id: int) -> RegisteredModel | None:
+        return self._models.get(model_id)
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+
+model_registry = ModelRegistry()
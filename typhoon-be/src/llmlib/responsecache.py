@@ -0,0 +1,215 @@
+import json
+import time
+import hashlib
+import importlib
+import unicodedata
+from collections import OrderedDict, defaultdict
+from typing import Any, NamedTuple
+
+from langchain_core.messages import BaseMessage
+from loguru import logger
+
+from src.llmlib.chatopenai import canonicalize
+from src import config
+
+
+class CachedResponse(NamedTuple):
+    content: str
+    tokens: int = 0
+    token_speed: float = 0.0
+
+
+class CacheEntry(NamedTuple):
+    key: str
+    # Everything but the last message, similar prompts only match within it
+    scope: str
+    text: str
+
+
+class MemoryStore:
+    """In-process LRU + TTL store, the default response cache backend.
+
+    Other backends only need async ``get``/``set``/``delete`` and a
+    ``(maxsize, ttl)`` constructor; values are plain JSON-serializable dicts.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+
+def load_store(backend: str, maxsize: int, ttl: float):
+    if backend == "memory":
+        return MemoryStore(maxsize, ttl)
+    module, _, name = backend.partition(":")
+    return getattr(importlib.import_module(module), name)(maxsize=maxsize, ttl=ttl)
+
+
+def normalize(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def _digest(*parts) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _ngrams(text: str, size: int = 3) -> set[str]:
+    # Character n-grams, Thai has no spaces between words
+    if len(text) <= size:
+        return {text}
+    return {text[idx : idx + size] for idx in range(len(text) - size + 1)}
+
+
+class NgramIndex:
+    """Inverted index of prompt n-grams used to find near-identical prompts."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[str, set[str]]] = OrderedDict()
+        self._postings: defaultdict[tuple[str, str], set[str]] = defaultdict(set)
+
+    def add(self, entry: CacheEntry):
+        self.remove(entry.key)
+        grams = _ngrams(entry.text)
+        self._entries[entry.key] = (entry.scope, grams)
+        for gram in grams:
+            self._postings[(entry.scope, gram)].add(entry.key)
+        while len(self._entries) > self.maxsize:
+            self.remove(next(iter(self._entries)))
+
+    def remove(self, key: str):
+        scope, grams = self._entries.pop(key, (None, ()))
+        for gram in grams:
+            keys = self._postings.get((scope, gram))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[(scope, gram)]
+
+    def nearest(self, entry: CacheEntry, threshold: float) -> str | None:
+        grams = _ngrams(entry.text)
+        shared: defaultdict[str, int] = defaultdict(int)
+        for gram in grams:
+            for key in self._postings.get((entry.scope, gram), ()):
+                shared[key] += 1
+
+        best, best_score = None, threshold
+        for key, count in shared.items():
+            other = self._entries[key][1]
+            score = count / (len(grams) + len(other) - count)
+            if score >= best_score:
+                best, best_score = key, score
+        return best
+
+
+class ResponseCache:  # pylint: disable=too-many-instance-attributes
+    """Opt-in cache of complete LLM answers keyed on the normalized request.
+
+    Exact matches hash (kind, model, params, messages). With a similarity
+    threshold, a miss also looks for a cached prompt whose last message is
+    close enough by character trigram Jaccard and whose earlier messages match.
+    """
+
+    def __init__(self, store, enabled: bool, similarity: float, max_similar: int):
+        self.store = store
+        self.enabled = enabled
+        self.similarity = similarity
+        self.index = NgramIndex(max_similar) if similarity > 0 else None
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def entry(
+        self, kind: str, model: str, params: Any, messages: list[BaseMessage]
+    ) -> CacheEntry:
+        turns = [(message.type, normalize(message.content)) for message in messages]
+        scope = _digest(kind, model, canonicalize(params), turns[:-1])
+        return CacheEntry(_digest(scope, turns[-1]), scope, turns[-1][1])
+
+    async def _lookup(self, entry: CacheEntry) -> CachedResponse | None:
+        value = await self.store.get(entry.key)
+        if value is not None:
+            self.hits += 1
+            return CachedResponse(**value)
+
+        if self.index is not None:
+            key = self.index.nearest(entry, self.similarity)
+            value = await self.store.get(key) if key is not None else None
+            if value is not None:
+                self.similar_hits += 1
+                return CachedResponse(**value)
+            if key is not None:
+                # Expired or evicted from the store meanwhile
+                self.index.remove(key)
+        return None
+
+    async def get(self, entry: CacheEntry) -> CachedResponse | None:
+        try:
+            cached = await self._lookup(entry)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            # A broken backend degrades to a miss, never to a failed chat
+            logger.warning(f"Response cache lookup failed: {exc}")
+            cached = None
+        if cached is None:
+            self.misses += 1
+        return cached
+
+    async def set(self, entry: CacheEntry, response: CachedResponse):
+        if not response.content:
+            return
+        try:
+            await self.store.set(entry.key, response._asdict())
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.warning(f"Failed to cache response: {exc}")
+            return
+        if self.index is not None:
+            self.index.add(entry)
+        self.stores += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else 0.0,
+            "evictions": getattr(self.store, "evictions", None),
+        }
+
+
+response_cache = ResponseCache(
+    load_store(
+        config.RESPONSE_CACHE_BACKEND,
+        maxsize=config.RESPONSE_CACHE_SIZE,
+        ttl=config.RESPONSE_CACHE_TTL,
+    ),
+    enabled=config.RESPONSE_CACHE,
+    similarity=config.RESPONSE_CACHE_SIMILARITY,
+    max_similar=config.RESPONSE_CACHE_SIZE,
+)
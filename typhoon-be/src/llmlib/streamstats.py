@@ -0,0 +1,30 @@
+class StreamStats:
+    """Output tokens of chat streams, split into delivered and wasted.
+
+    Wasted tokens were generated upstream but never reached the client,
+    i.e. whatever was in flight when the client disconnected.
+    """
+
+    def __init__(self):
+        self.counters = dict.fromkeys(
+            ("completed", "disconnected", "expired", "failed"), 0
+        )
+        self.delivered_tokens = 0
+        self.wasted_tokens = 0
+
+    def finished(self, outcome: str, generated_tokens: int, delivered_tokens: int):
+        self.counters[outcome] += 1
+        self.delivered_tokens += delivered_tokens
+        self.wasted_tokens += max(0, generated_tokens - delivered_tokens)
+
+    def stats(self) -> dict:
+        generated = self.delivered_tokens + self.wasted_tokens
+        return {
+            **self.counters,
+            "delivered_tokens": self.delivered_tokens,
+            "wasted_tokens": self.wasted_tokens,
+            "wasted_ratio": self.wasted_tokens / generated if generated else 0.0,
+        }
+
+
+stream_stats = StreamStats()
@@ -0,0 +1,188 @@
+import re
+import json
+import asyncio
+from collections import Counter, defaultdict
+
+from langchain_core.messages import HumanMessage
+from loguru import logger
+from pythainlp.corpus import thai_stopwords
+from pythainlp.tokenize import word_tokenize
+
+from src.llmlib.chatopenai import get_llm
+from src import config
+
+_WORD = re.compile(r"\w", re.UNICODE)
+# pythainlp only ships Thai stopwords, users mix in English often enough
+ENGLISH_STOPWORDS = frozenset(
+    "a an and are as at be but by can could do does for from how i if in is it "
+    "me my of on or please should so that the this to was what when where which "
+    "who why will with would you your".split()
+)
+
+
+class ExtractiveTitleGenerator:
+    """Builds a title from the message's own keywords, no upstream call.
+
+    Thai has no spaces between words, so the text is segmented with
+    pythainlp's dictionary tokenizer before stopwords are dropped. The most
+    frequent remaining words are kept in the order they first appear.
+    """
+
+    def __init__(self, max_words: int):
+        self.max_words = max_words
+        self._stopwords: frozenset[str] | None = None
+
+    def _extract(self, message: str) -> str:
+        if self._stopwords is None:
+            self._stopwords = thai_stopwords() | ENGLISH_STOPWORDS
+        words = [
+            word
+            for word in word_tokenize(message, keep_whitespace=False)
+            if _WORD.search(word) and word.casefold() not in self._stopwords
+        ]
+        if not words:
+            return message.strip()[:50]
+
+        counts = Counter(word.casefold() for word in words)
+        first_seen = {}
+        for idx, word in enumerate(words):
+            first_seen.setdefault(word.casefold(), (idx, word))
+        top = sorted(counts, key=lambda key: (-counts[key], first_seen[key][0]))
+        keep = sorted(first_seen[key] for key in top[: self.max_words])
+        return " ".join(word for _, word in keep)
+
+    async def generate(self, message: str, shortname: str) -> str:
+        # pylint: disable=unused-argument
+        # Segmentation is CPU bound and loads a dictionary on first use
+        return await asyncio.to_thread(self._extract, message)
+
+
+class LLMTitleGenerator:
+    """Asks a model for a title; TITLE_MODEL points it at a small one."""
+
+    def __init__(self, model: str | None, max_tokens: int, max_chars: int):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.max_chars = max_chars
+
+    async def generate(self, message: str, shortname: str) -> str:
+        llm = get_llm(
+            model=self.model or shortname, max_tokens=self.max_tokens, temperature=0
+        )
+        title = await llm.ainvoke(
+            [
+                config.GET_SESSION_NAME_PROMPT,
+                HumanMessage(
+                    content=f"{message[: self.max_chars]}\n"
+                    "ช่วยคิดชื่อเท่ห์จากข้อความข้างต้นหน่อยนะครับ"
+                ),
+            ]
+        )
+        return title.content.strip()
+
+
+class BatchTitleGenerator:  # pylint: disable=too-many-instance-attributes
+    """Collects titles requested within ``interval`` seconds into one call.
+
+    All pending first messages for a model go out as a numbered list and the
+    model answers with a JSON array of titles. Anything the answer does not
+    cover falls back to the extractive generator.
+    """
+
+    def __init__(
+        self,
+        model: str | None,
+        interval: float,
+        max_batch: int,
+        max_chars: int,
+        fallback: ExtractiveTitleGenerator,
+    ):
+        self.model = model
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_chars = max_chars
+        self.fallback = fallback
+        self._tasks: set[asyncio.Task] = set()
+        self._pending: defaultdict[str, list[tuple[str, asyncio.Future]]] = defaultdict(
+            list
+        )
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+
+    async def generate(self, message: str, shortname: str) -> str:
+        model = self.model or shortname
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[model].append((message, future))
+        if len(self._pending[model]) >= self.max_batch:
+            self._flush(model)
+        elif model not in self._timers:
+            self._timers[model] = loop.call_later(self.interval, self._flush, model)
+        return await future
+
+    def _flush(self, model: str):
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(model, [])
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(model, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _titles(self, model: str, messages: list[str]) -> list[str]:
+        numbered = "\n".join(
+            f"{idx}. {' '.join(message[: self.max_chars].split())}"
+            for idx, message in enumerate(messages, start=1)
+        )
+        llm = get_llm(
+            model=model,
+            max_tokens=config.TITLE_MAX_TOKENS * len(messages),
+            temperature=0,
+        )
+        answer = await llm.ainvoke(
+            [config.GET_SESSION_NAMES_PROMPT, HumanMessage(content=numbered)]
+        )
+        content = answer.content
+        titles = json.loads(content[content.find("[") : content.rfind("]") + 1])
+        return [str(title).strip() for title in titles]
+
+    async def _run(self, model: str, batch: list[tuple[str, asyncio.Future]]):
+        messages = [message for message, _ in batch]
+        try:
+            titles = await self._titles(model, messages)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.warning(f"Batched title generation failed: {exc}")
+            titles = []
+
+        for idx, (message, future) in enumerate(batch):
+            if future.done():
+                continue
+            if idx < len(titles) and titles[idx]:
+                future.set_result(titles[idx])
+                continue
+            try:
+                future.set_result(await self.fallback.generate(message, model))
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                future.set_exception(exc)
+
+
+def create_title_generator(kind: str):
+    extractive = ExtractiveTitleGenerator(config.TITLE_MAX_WORDS)
+    if kind == "extractive":
+        return extractive
+    if kind == "batch":
+        return BatchTitleGenerator(
+            config.TITLE_MODEL,
+            interval=config.TITLE_BATCH_INTERVAL,
+            max_batch=config.TITLE_BATCH_SIZE,
+            max_chars=config.TITLE_INPUT_CHARS,
+            fallback=extractive,
+        )
+    if kind == "llm":
+        return LLMTitleGenerator(
+            config.TITLE_MODEL, config.TITLE_MAX_TOKENS, config.TITLE_INPUT_CHARS
+        )
+    raise ValueError(f"Unknown title generator: {kind}")
+
+
+title_generator = create_title_generator(config.TITLE_GENERATOR)
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import config
+from src.metrics import tokenizer_encode_duration
+
+# Shared across all streams so tokenizer work never runs on the event loop
+_executor = ThreadPoolExecutor(
+    max_workers=config.TOKEN_COUNT_WORKERS, thread_name_prefix="token-count"
+)
+
+
+def _token_lengths(tokenizer, texts: list[str]) -> list[int]:
+    with tokenizer_encode_duration.time():
+        encoded = tokenizer(texts, add_special_tokens=False)["input_ids"]
+    return [len(ids) for ids in encoded]
+
+
+def _count_tokens(tokenizer, texts: list[str]) -> int:
+    return sum(_token_lengths(tokenizer, texts))
+
+
+async def token_lengths(tokenizer, texts: list[str]) -> list[int]:
+    """Per-text token counts, batch-encoded off the event loop."""
+    if not texts:
+        return []
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _token_lengths, tokenizer, texts)
+
+
+class TokenCounter:
+    """Incremental token accounting for a single streamed answer.
+
+    Provider usage metadata wins whenever the upstream reports it. Otherwise
+    chunks are buffered and batch-encoded in a worker thread once per
+    ``flush_interval`` seconds, so ``total_tokens`` lags by at most one window.
+    """
+
+    def __init__(self, tokenizer, flush_interval: float | None = None):
+        self.tokenizer = tokenizer
+        self.flush_interval = (
+            config.TOKEN_COUNT_FLUSH_INTERVAL
+            if flush_interval is None
+            else flush_interval
+        )
+        self.total_tokens = 0
+        self._pending: list[str] = []
+        self._last_flush = time.monotonic()
+        self._provider_usage = False
+
+    async def add(self, content: str, usage_metadata: dict | None = None) -> int:
+        if usage_metadata and usage_metadata.get("output_tokens"):
+            # Provider counts are authoritative, stop tokenizing locally
+            self._provider_usage = True
+            self._pending.clear()
+            self.total_tokens = max(self.total_tokens, usage_metadata["output_tokens"])
+            return self.total_tokens
+
+        if self._provider_usage or not content:
+            return self.total_tokens
+
+        self._pending.append(content)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+        return self.total_tokens
+
+    async def flush(self) -> int:
+        self._last_flush = time.monotonic()
+        if not self._pending or self.tokenizer is None:
+            self._pending.clear()
+            return self.total_tokens
+
+        batch, self._pending = self._pending, []
+        loop = asyncio.get_running_loop()
+        self.total_tokens += await loop.run_in_executor(
+            _executor, _count_tokens, self.tokenizer, batch
+        )
+        return self.total_tokens
@@ -1,11 +1,173 @@
-from functools import cache
+import math
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 
-from transformers import AutoTokenizer
+from transformers import AutoTokenizer, PreTrainedTokenizerFast
 
 from loguru import logger
 
+from src.llmlib import tokenizer_artifacts
+from src import config
+from src.metrics import tokenizer_load_duration
 
-@cache
-def get_tokenizer(model_name: str) -> AutoTokenizer | None:
-    logger.debug(f"Getting tokenizer for model: {model_name}")
-    return AutoTokenizer.from_pretrained(model_name)
+
+class ApproximateTokenizer:
+    """Character-based stand-in used while the real tokenizer is loading."""
+
+    is_fast = False
+
+    def __init__(self, chars_per_token: float):
+        self.chars_per_token = chars_per_token
+
+    def _count(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token) if text else 0
+
+    def tokenize(self, text: str) -> list[str]:
+        return [""] * self._count(text)
+
+    def __call__(self, texts, add_special_tokens: bool = True):
+        if isinstance(texts, str):
+            return {"input_ids": [0] * self._count(texts)}
+        return {"input_ids": [[0] * self._count(text) for text in texts]}
+
+
+def _estimate_size(tokenizer: PreTrainedTokenizerFast) -> int:
+    # The serialized rust tokenizer tracks its resident vocab/merges size closely
+    return len(tokenizer.backend_tokenizer.to_str())
+
+
+class TokenizerRegistry:  # pylint: disable=too-many-instance-attributes
+    """Loads fast tokenizers in the background and keeps them under a memory budget.
+
+    ``get`` never blocks: until a tokenizer is ready the approximate counter is
+    returned and a background load is scheduled. Least recently used tokenizers
+    are evicted once the estimated footprint exceeds ``memory_budget`` bytes.
+    """
+
+    def __init__(
+        self,
+        memory_budget: int,
+        max_workers: int,
+        chars_per_token: float,
+        artifact_dir: str | None = None,
+        retry_after: float = 300.0,
+    ):
+        self.memory_budget = memory_budget
+        self.artifact_dir = artifact_dir
+        self.artifacts = tokenizer_artifacts.read_manifest(artifact_dir)
+        self.retry_after = retry_after
+        self.approximate = ApproximateTokenizer(chars_per_token)
+        self._loaded: OrderedDict[str, tuple[PreTrainedTokenizerFast, int]] = (
+            OrderedDict()
+        )
+        self._loading: dict[str, Future] = {}
+        self._failed: dict[str, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tokenizer-load"
+        )
+
+    def _load(self, model_name: str):
+        logger.debug(f"Loading tokenizer for model: {model_name}")
+        start = time.perf_counter()
+        try:
+            if model_name in self.artifacts:
+                tokenizer = tokenizer_artifacts.load(
+                    self.artifact_dir, self.artifacts[model_name]
+                )
+            elif config.TOKENIZER_OFFLINE:
+                raise LookupError(f"{model_name} is not in the tokenizer artifacts")
+            else:
+                tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+            if not tokenizer.is_fast:
+                raise ValueError(f"No fast tokenizer available for {model_name}")
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.warning(f"Failed to load tokenizer {model_name}: {exc}")
+            tokenizer_load_duration.labels("failed").observe(
+                time.perf_counter() - start
+            )
+            with self._lock:
+                self._loading.pop(model_name, None)
+                self._failed[model_name] = (time.monotonic(), str(exc))
+            return
+
+        tokenizer_load_duration.labels("loaded").observe(time.perf_counter() - start)
+        size = _estimate_size(tokenizer)
+        with self._lock:
+            self._loading.pop(model_name, None)
+            self._loaded[model_name] = (tokenizer, size)
+            self._evict(keep=model_name)
+        logger.info(f"Tokenizer ready: {model_name} (~{size / 2**20:.1f} MiB)")
+
+    def _evict(self, keep: str):
+        while self.memory_used > self.memory_budget and len(self._loaded) > 1:
+            name = next(iter(self._loaded))
+            if name == keep:
+                self._loaded.move_to_end(name)
+                continue
+            self._loaded.pop(name)
+            logger.info(f"Evicted tokenizer {name} to stay within memory budget")
+
+    @property
+    def memory_used(self) -> int:
+        return sum(size for _, size in self._loaded.values())
+
+    def preload(self, model_name: str) -> Future | None:
+        with self._lock:
+            if model_name in self._loaded or model_name in self._loading:
+                return self._loading.get(model_name)
+            failed = self._failed.get(model_name)
+            if failed and time.monotonic() - failed[0] < self.retry_after:
+                return None
+            self._failed.pop(model_name, None)
+            future = self._executor.submit(self._load, model_name)
+            self._loading[model_name] = future
+            return future
+
+    def load_artifacts(self) -> int:
+        """Loads every tokenizer in the artifact manifest on the calling thread.
+
+        The gunicorn master calls this before forking so workers share the
+        loaded vocabularies copy-on-write. It never touches the executor,
+        threads started in the master would not survive the fork.
+        """
+        for model_name in self.artifacts:
+            self._load(model_name)
+        with self._lock:
+            return len(self._loaded)
+
+    def get(self, model_name: str) -> PreTrainedTokenizerFast | ApproximateTokenizer:
+        with self._lock:
+            entry = self._loaded.get(model_name)
+            if entry is not None:
+                self._loaded.move_to_end(model_name)
+                return entry[0]
+        self.preload(model_name)
+        return self.approximate
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": list(self._loaded),
+                "loading": list(self._loading),
+                "failed": {name: err for name, (_, err) in self._failed.items()},
+                "memory_used": self.memory_used,
+                "memory_budget": self.memory_budget,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+tokenizer_registry = TokenizerRegistry(
+    memory_budget=config.TOKENIZER_MEMORY_BUDGET_MB * 2**20,
+    max_workers=config.TOKENIZER_LOAD_WORKERS,
+    chars_per_token=config.APPROX_CHARS_PER_TOKEN,
+    artifact_dir=config.TOKENIZER_ARTIFACT_DIR,
+)
+
+
+def get_tokenizer(model_name: str) -> PreTrainedTokenizerFast | ApproximateTokenizer:
+    return tokenizer_registry.get(model_name)
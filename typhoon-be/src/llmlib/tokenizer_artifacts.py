@@ -0,0 +1,137 @@
+"""Build-time tokenizer artifacts so workers never resolve tokenizers via the hub.
+
+uv run python -m src.llmlib.tokenizer_artifacts --out tokenizers
+uv run python -m src.llmlib.tokenizer_artifacts --database-url $ALEMBIC_DATABASE_URL
+"""
+
+import re
+import json
+import hashlib
+import argparse
+import datetime
+from pathlib import Path
+
+from tokenizers import Tokenizer
+from transformers import AutoTokenizer, PreTrainedTokenizerFast
+from loguru import logger
+
+from src import config
+
+MANIFEST = "manifest.json"
+SPECIAL_TOKENS = (
+    "bos_token",
+    "eos_token",
+    "unk_token",
+    "pad_token",
+    "sep_token",
+    "cls_token",
+    "mask_token",
+)
+
+
+def _slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "--", model_name)
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _llm_names_from_db(database_url: str) -> list[str]:
+    # pylint: disable=import-outside-toplevel
+    from sqlalchemy import create_engine, select
+    from src.models import LLM
+
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        return [row.fullname for row in conn.execute(select(LLM.fullname))]
+
+
+def build(model_names: list[str], out_dir: Path) -> dict:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    entries = {}
+    for model_name in dict.fromkeys(model_names):
+        logger.info(f"Serializing tokenizer: {model_name}")
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            # One unreachable or misnamed model must not fail the whole build
+            logger.warning(f"Skipping {model_name}: {exc}")
+            continue
+        if not tokenizer.is_fast:
+            logger.warning(f"Skipping {model_name}: no fast tokenizer available")
+            continue
+
+        target = out_dir / _slug(model_name)
+        target.mkdir(exist_ok=True)
+        tokenizer.backend_tokenizer.save(str(target / "tokenizer.json"))
+        special_tokens = {
+            key: str(getattr(tokenizer, key))
+            for key in SPECIAL_TOKENS
+            if getattr(tokenizer, key, None) is not None
+        }
+        entries[model_name] = {
+            "path": target.name,
+            "sha256": _sha256(target / "tokenizer.json"),
+            "special_tokens": special_tokens,
+        }
+
+    if not entries:
+        raise RuntimeError(f"No tokenizer could be serialized from {model_names}")
+
+    # Version is content-addressed so a rebuild with the same tokenizers is a no-op
+    version = hashlib.sha256(
+        json.dumps(
+            {name: entry["sha256"] for name, entry in entries.items()}, sort_keys=True
+        ).encode()
+    ).hexdigest()[:12]
+    manifest = {
+        "version": version,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "tokenizers": entries,
+    }
+    (out_dir / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    logger.info(f"Wrote {len(entries)} tokenizers to {out_dir} (version {version})")
+    return manifest
+
+
+def read_manifest(artifact_dir: str | None) -> dict:
+    if not artifact_dir:
+        return {}
+    path = Path(artifact_dir) / MANIFEST
+    if not path.exists():
+        logger.warning(f"No tokenizer manifest found at {path}")
+        return {}
+    return json.loads(path.read_text()).get("tokenizers", {})
+
+
+def load(artifact_dir: str, entry: dict) -> PreTrainedTokenizerFast:
+    # tokenizers reads and parses the file natively, no hub lookup or python-side copy
+    backend = Tokenizer.from_file(
+        str(Path(artifact_dir) / entry["path"] / "tokenizer.json")
+    )
+    return PreTrainedTokenizerFast(tokenizer_object=backend, **entry["special_tokens"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", type=Path, default=Path("tokenizers"))
+    parser.add_argument(
+        "--database-url",
+        help="sync database url to also include every fullname in the llms table",
+    )
+    parser.add_argument("models", nargs="*", help="extra model names to include")
+    args = parser.parse_args()
+
+    names = [*config.TYPHOON_MODELS_NAME_IN_HF, *args.models]
+    if args.database_url:
+        names += _llm_names_from_db(args.database_url)
+    build(names, args.out)
+
+
+if __name__ == "__main__":
+    main()
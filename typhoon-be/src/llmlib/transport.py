@@ -0,0 +1,103 @@
+import time
+import asyncio
+
+import httpx
+
+from src import config
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class LimitedTransport(httpx.AsyncBaseTransport):
+    """Caps in-flight upstream requests and tracks how many are queued.
+
+    A slot is held until the response body is closed, so a streamed completion
+    occupies its slot for the whole stream, not only until headers arrive.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_streams: int):
+        self._transport = transport
+        self._semaphore = asyncio.Semaphore(max_streams)
+        self.max_streams = max_streams
+        self.waiting = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.wait_seconds = 0.0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.wait_seconds += time.monotonic() - start
+        self.requests += 1
+        self.in_flight += 1
+
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight -= 1
+                self._semaphore.release()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "max_streams": self.max_streams,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "wait_seconds": self.wait_seconds,
+        }
+
+
+llm_transport = LimitedTransport(
+    httpx.AsyncHTTPTransport(
+        http2=config.LLM_HTTP2,
+        limits=httpx.Limits(
+            max_connections=config.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY,
+        ),
+        retries=1,
+    ),
+    max_streams=config.LLM_MAX_CONCURRENT_STREAMS,
+)
+
+# Process-wide client injected into every ChatOpenAI built by get_llm
+http_client = httpx.AsyncClient(
+    transport=llm_transport,
+    timeout=httpx.Timeout(config.LLM_TIMEOUT, connect=10.0),
+)
+
+
+async def close_http_client():
+    await http_client.aclose()
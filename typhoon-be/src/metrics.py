@@ -0,0 +1,102 @@
+"""Prometheus metrics for the backend, served on ``/metrics``.
+
+Histograms here are observed once per request, stream or token-count batch,
+never per streamed chunk. Caches, pools and queues already keep their own
+counters, ``src.routers.metrics`` reads those at scrape time instead.
+
+Under gunicorn with more than one worker, gunicorn.conf.py sets
+PROMETHEUS_MULTIPROC_DIR so these metrics are summed across workers.
+"""
+
+import os
+import time
+
+from prometheus_client import Counter, Histogram
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# SSE responses are timed until their last event, hence the long tail
+DURATION_BUCKETS = (*Histogram.DEFAULT_BUCKETS[:-1], 30, 60, 120, 300)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to send the full response, by route template",
+    ["method", "route", "status"],
+    buckets=DURATION_BUCKETS,
+)
+chat_streams = Counter(
+    "chat_streams", "Finished chat streams by outcome", ["model", "outcome"]
+)
+chat_stream_tokens = Counter(
+    "chat_stream_tokens",
+    "Output tokens counted on chat streams by outcome",
+    ["model", "outcome"],
+)
+chat_stream_ttft = Histogram(
+    "chat_stream_ttft_seconds",
+    "Time from admission to the first answer event",
+    ["model"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 30),
+)
+chat_stream_token_speed = Histogram(
+    "chat_stream_token_speed",
+    "Output tokens per second of finished chat streams",
+    ["model"],
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 150, 250),
+)
+tokenizer_encode_duration = Histogram(
+    "tokenizer_encode_seconds",
+    "Time to batch-encode texts for token counting",
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+tokenizer_load_duration = Histogram(
+    "tokenizer_load_seconds",
+    "Time to load a tokenizer",
+    ["result"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+db_pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to get a connection from the pool, including opening a new one",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30),
+)
+db_pool_events = Counter("db_pool_events", "Connection pool events", ["event"])
+answer_writes = Counter(
+    "answer_writes", "Writes of streamed bot answers to the database", ["kind"]
+)
+
+
+class MetricsMiddleware:
+    """Times every HTTP request by its route template, e.g. ``/api/users/{id}``.
+
+    Plain ASGI, so a streamed response passes through untouched and is timed
+    until its last event for two clock reads per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # FastAPI leaves the matched route in the scope
+            route = scope.get("route")
+            http_request_duration.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status),
+            ).observe(time.perf_counter() - start)
@@ -2,7 +2,17 @@ import enum
 import datetime
 
 from sqlalchemy.types import Enum
-from sqlalchemy import Column, DateTime, Text, Integer, ForeignKey, JSON, DECIMAL
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Text,
+    Integer,
+    ForeignKey,
+    JSON,
+    DECIMAL,
+    Index,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import DeclarativeBase
 from pydantic import BaseModel
 
@@ -51,6 +61,10 @@ class ChatSession(Base):
         onupdate=get_utc_now,
     )
 
+    __table_args__ = (
+        Index("ix_chat_sessions_user_id_updated_at", user_id, updated_at.desc()),
+    )
+
 
 class ChatSessionSchema(BaseModel):
     id: int
@@ -63,6 +77,12 @@ class ChatSessionSchema(BaseModel):
         orm_mode = True
 
 
+class ChatSessionSummarySchema(ChatSessionSchema):
+    message_count: int
+    last_message_at: datetime.datetime | None
+    total_tokens: int
+
+
 class RoleEnum(enum.Enum):
     USER = "user"
     BOT = "bot"
@@ -75,21 +95,75 @@ class PreferenceEnum(enum.Enum):
 
 
 class Message(Base):
+    """One turn of a chat session, its text lives in ``message_versions``.
+
+    Regenerating or re-recording a turn adds a version and moves
+    ``current_version_id``, so the text of earlier versions is never rewritten.
+    """
+
     __tablename__ = "messages"
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     chat_session_id = Column(Integer, ForeignKey("chat_sessions.id"))
-    message = Column(Text)
     role = Column(Enum(RoleEnum))
-    total_tokens = Column(Integer)
-    token_speed = Column(DECIMAL(10, 2))
-    preference = Column(Enum(PreferenceEnum), default=PreferenceEnum.NA)
-    created_at = Column(DateTime(timezone=True), default=get_utc_now)
+    # Deferred, a message and its first version are inserted together
+    current_version_id = Column(
+        Integer,
+        ForeignKey(
+            "message_versions.id",
+            name="fk_messages_current_version_id",
+            use_alter=True,
+            deferrable=True,
+            initially="DEFERRED",
+        ),
+    )
+    # Partition key, monthly partitions are kept up by src.io.partitions
+    created_at = Column(DateTime(timezone=True), primary_key=True, default=get_utc_now)
     updated_at = Column(
         DateTime(timezone=True),
         default=get_utc_now,
         onupdate=get_utc_now,
     )
 
+    __table_args__ = (
+        Index("ix_messages_chat_session_id_created_at", chat_session_id, created_at),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class MessageVersion(Base):
+    """Append-only text of a message, one row per recording of it."""
+
+    __tablename__ = "message_versions"
+    id = Column(Integer, primary_key=True)
+    # Not a foreign key, partitioned messages have no unique key on id alone
+    message_id = Column(Integer, nullable=False)
+    # 1 for the first recording of the message
+    version = Column(Integer, nullable=False)
+    message = Column(Text)
+    total_tokens = Column(Integer)
+    token_speed = Column(DECIMAL(10, 2))
+    preference = Column(Enum(PreferenceEnum), default=PreferenceEnum.NA)
+    created_at = Column(DateTime(timezone=True), default=get_utc_now)
+    # Set once a newer version replaces this one, None for the current version
+    superseded_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        UniqueConstraint(message_id, version),
+        Index(
+            "ix_message_versions_current",
+            message_id,
+            unique=True,
+            postgresql_where=superseded_at.is_(None),
+        ),
+        # Rated versions across the full history, for preference analytics
+        Index(
+            "ix_message_versions_rated",
+            preference,
+            created_at,
+            postgresql_where=preference != PreferenceEnum.NA,
+        ),
+    )
+
 
 class MessageSchema(BaseModel):
     id: int
@@ -0,0 +1,38 @@
+from fastapi import APIRouter
+
+from src.io.catalog import llm_catalog
+from src.io.history import history_cache
+from src.io.jobs import job_pool
+from src.llmlib.admission import admission
+from src.llmlib.chatopenai import client_cache
+from src.llmlib.context import context_assembler
+from src.llmlib.responsecache import response_cache
+from src.llmlib.streamstats import stream_stats
+from src.llmlib.tokenizer import tokenizer_registry
+
+
+router = APIRouter()
+
+
+@router.get("/api/health/ready/v1")
+async def readiness():
+    tokenizers = tokenizer_registry.status()
+    return {
+        "status": "ok",
+        "tokenizers_ready": not tokenizers["loading"],
+        "tokenizers": tokenizers,
+        "jobs": job_pool.stats(),
+        "admission": admission.stats(),
+        "streams": stream_stats.stats(),
+    }
+
+
+@router.get("/api/health/caches/v1")
+async def caches():
+    return {
+        "responses": response_cache.stats(),
+        "history": history_cache.stats(),
+        "context": context_assembler.stats(),
+        "llm_clients": client_cache.stats(),
+        "llm_catalog": {"etag": llm_catalog.etag, "reloads": llm_catalog.reloads},
+    }
@@ -1,121 +1,417 @@
 import time
-import re
-import json
+import asyncio
 from typing import Any
+from collections.abc import AsyncIterator
 
 from loguru import logger
-from fastapi import APIRouter
-from sse_starlette.sse import EventSourceResponse
-from langchain.schema import HumanMessage, AIMessage
-from pydantic import BaseModel, field_validator
+from fastapi import APIRouter, HTTPException, Request
+from starlette.background import BackgroundTask
+from langchain.schema import HumanMessage
+from langchain_core.messages import BaseMessage, BaseMessageChunk, SystemMessage
+from pydantic import BaseModel
 
+from src.io.answers import AnswerRecorder
+from src.io.history import Turn, history_cache
+from src.io.jobs import job_pool
+from src.llmlib.context import ChatModel, context_assembler
 from src.llmlib.tokenizer import get_tokenizer
 from src.llmlib.chatopenai import get_llm
+from src.llmlib.params import ChatParams
+from src.llmlib.registry import RegisteredModel, model_registry
+from src.llmlib.admission import AdmissionRejected, Ticket, admission
+from src.llmlib.tokencounter import TokenCounter, token_lengths
+from src.llmlib.streamstats import stream_stats
+from src.llmlib.responsecache import CacheEntry, CachedResponse, response_cache
+from src.llmlib.titles import title_generator
+from src.models import RoleEnum
+from src.sse import DONE, DrainingEventSourceResponse, coalesce, frame
+from src.metrics import (
+    chat_stream_tokens,
+    chat_stream_token_speed,
+    chat_stream_ttft,
+    chat_streams,
+)
 from src import config
 
 
-def camel_to_snake(name):
-    s1 = re.sub("(.)([A-Z][a-z]+)", r"\1_\2", name)
-    return re.sub("([a-z0-9])([A-Z])", r"\1_\2", s1).lower()
-
-
 class Message(BaseModel):
     role: str
     content: str
 
 
-class ModelName(BaseModel):
-    fullname: str
-    shortname: str
-
-
 class ChatRequest(BaseModel):
+    # With session_id set, messages only carries the turns not registered yet
     messages: list[Message]
-    model: ModelName
+    # llms.id of the model to answer with
+    model_id: int
+    session_id: int | None = None
+    # Who is asking, concurrent chats are limited per user
+    email: str | None = None
+    # The bot message a regenerated answer replaces
+    message_id: int | None = None
+    # Checked against the model's param schema once the model is known
     params: dict[str, Any] = {}
 
-    @field_validator("params")
-    @classmethod
-    def convert_params_keys_to_snake_case(cls, v):
-        if isinstance(v, dict):
-            v = {camel_to_snake(key): val for key, val in v.items()}
-
-            # intercept output length to be max_tokens to be consistent with OpenAI API
-            # remove top_k as it doesn't seem to be supported by OpenAI API
-            v = {
-                key if key != "output_length" else "max_tokens": val
-                for key, val in v.items()
-                if key not in ("top_k", "repetition_penalty")
-            }
-        return v
-
 
 router = APIRouter()
 
+DEADLINE_ERROR = "The answer took too long and was cut off"
+
+
+def registered_model(model_id: int) -> RegisteredModel:
+    model = model_registry.get(model_id)
+    if model is None:
+        raise HTTPException(status_code=404, detail="Model not found")
+    return model
+
+
+async def build_messages(
+    request: ChatRequest,
+    model: ChatModel,
+    params: ChatParams,
+    system_prompt: SystemMessage,
+) -> list[BaseMessage]:
+    turns = [
+        Turn(None, RoleEnum.USER if msg.role == "user" else RoleEnum.BOT, msg.content)
+        for msg in request.messages
+    ]
+    if request.session_id is not None:
+        history = await history_cache.get(request.session_id)
+        # The client registers its message before asking for a reply, so the
+        # stored transcript may already end with the turns it sent
+        sent = [(turn.role, turn.content) for turn in turns]
+        if (
+            sent
+            and [(turn.role, turn.content) for turn in history[-len(sent) :]] == sent
+        ):
+            turns = []
+        turns = history + turns
+
+    return await context_assembler.assemble(
+        turns,
+        system_prompt,
+        model,
+        max_tokens=params.get("max_tokens"),
+        session_id=request.session_id,
+    )
+
+
+def answer_recorder(request: ChatRequest) -> AnswerRecorder | None:
+    # Answers are persisted for signed-in chats with somewhere to put them
+    if not request.email or (request.session_id is None and request.message_id is None):
+        return None
+    return AnswerRecorder(
+        request.email,
+        request.session_id,
+        request.message_id,
+        config.ANSWER_FLUSH_INTERVAL,
+    )
+
+
+async def replay(cached: CachedResponse, recorder: AnswerRecorder | None):
+    """Stream a cached answer back with the same payloads as a live one."""
+    content, step = cached.content, config.RESPONSE_CACHE_REPLAY_CHUNK
+    for end in range(step, len(content) + step, step):
+        yield frame(
+            {
+                "content": content[end - step : end],
+                "tokens": cached.tokens * min(end, len(content)) // len(content),
+                "tokenSpeed": cached.token_speed,
+            }
+        )
+    yield frame(
+        {"content": "", "tokens": cached.tokens, "tokenSpeed": cached.token_speed}
+    )
+    if recorder is not None:
+        message_id = await recorder.finish(content, cached.tokens, cached.token_speed)
+        yield frame({"content": "", "messageId": message_id})
+    yield DONE
+
 
 @router.post("/api/llm/sessionname/v1")
 async def llm_session_name(request: ChatRequest):
-    messages = request.messages
-    messages = [
-        HumanMessage(content=msg.content)
-        if msg.role == "user"
-        else AIMessage(content=msg.content)
-        for msg in messages
-    ]
-    params = request.params
+    # Titles only need what the user asked, not the whole transcript
+    model = registered_model(request.model_id)
+    message = "\n".join(msg.content for msg in request.messages if msg.role == "user")
 
-    chat = get_llm(**params, model=request.model.shortname)
-    session_name = await chat.ainvoke([config.GET_SESSION_NAME_PROMPT, *messages])
+    entry = None
+    if response_cache.enabled:
+        entry = response_cache.entry(
+            "sessionname",
+            config.TITLE_MODEL or model.fullname,
+            {},
+            [HumanMessage(content=message)],
+        )
+        cached = await response_cache.get(entry)
+        if cached is not None:
+            return cached.content
 
-    return session_name.content
+    session_name = await title_generator.generate(message, model.shortname)
 
+    if entry is not None:
+        await response_cache.set(entry, CachedResponse(session_name))
+    return session_name
 
-@router.post("/api/llm/chat/v1")
-async def llm_chat(request: ChatRequest):
-    messages = request.messages
-    messages = [
-        HumanMessage(content=msg.content)
-        if msg.role == "user"
-        else AIMessage(content=msg.content)
-        for msg in messages
-    ]
-    params = request.params
-    logger.debug(f"Message: {messages}")
-    logger.debug(f"Params: {params}")
-    logger.debug(f"Model: {request.model}")
-
-    tokenizer = get_tokenizer(request.model.fullname)
-    chat = get_llm(**params, model=request.model.shortname)
-
-    async def event_generator():
-        total_tokens = 0
-        start_time = time.time()
-
-        async for chunk in chat.astream([config.GENERAL_PROMPT, *messages]):
-            token_count = 0
-            if tokenizer:
-                token_count = len(tokenizer.tokenize(chunk.content))
-            total_tokens += token_count
-            elapsed_time = time.time() - start_time
-            token_speed = total_tokens / elapsed_time if elapsed_time > 0 else 0
-
-            payload = {
-                "content": chunk.content,
-                "tokens": total_tokens,
-                "tokenSpeed": token_speed,
+
+async def queue_updates(ticket: Ticket):
+    """Queue positions while the stream waits for a slot, or why it gave up."""
+    try:
+        async for position in admission.wait(ticket):
+            yield frame({"content": "", "queued": position})
+    except AdmissionRejected as exc:
+        yield frame({"content": "", "error": exc.reason})
+        yield DONE
+
+
+class AnswerProgress:  # pylint: disable=too-many-instance-attributes
+    """Running totals of a streamed answer and the SSE frames carrying it."""
+
+    def __init__(self, tokenizer, stats_every: int):
+        self.counter = TokenCounter(tokenizer)
+        self.stats_every = max(1, stats_every)
+        self.start_time = time.time()
+        self.first_event_time: float | None = None
+        self.parts: list[str] = []
+        # How many of the parts the client has received
+        self.delivered = 0
+        self.total_tokens = 0
+        self.token_speed = 0.0
+
+    @property
+    def answer(self) -> str:
+        return "".join(self.parts)
+
+    @property
+    def delivered_answer(self) -> str:
+        return "".join(self.parts[: self.delivered])
+
+    def _update_speed(self):
+        elapsed_time = time.time() - self.start_time
+        self.token_speed = self.total_tokens / elapsed_time if elapsed_time > 0 else 0
+
+    async def add(self, chunks: list[BaseMessageChunk]) -> bytes:
+        for chunk in chunks:
+            self.total_tokens = await self.counter.add(
+                chunk.content, chunk.usage_metadata
+            )
+        self._update_speed()
+        content = "".join(chunk.content for chunk in chunks)
+        if not self.parts:
+            self.first_event_time = time.time()
+        self.parts.append(content)
+
+        payload = {"content": content}
+        # The client keeps the last stats it saw, they need not ride on every event
+        if len(self.parts) % self.stats_every == 0:
+            payload["tokens"] = self.total_tokens
+            payload["tokenSpeed"] = self.token_speed
+        # Formatted only when a sink takes DEBUG
+        logger.debug("SSE payload {}", payload)
+        return frame(payload)
+
+    async def finish(self, **extra) -> bytes:
+        # Emit the final count for whatever was still buffered in the last window
+        self.total_tokens = await self.counter.flush()
+        self._update_speed()
+        return frame(
+            {
+                "content": "",
+                "tokens": self.total_tokens,
+                "tokenSpeed": self.token_speed,
+                **extra,
             }
-            logger.debug(payload)
-            yield json.dumps(payload)
+        )
+
+
+async def record_partial_answer(
+    recorder: AnswerRecorder | None,
+    model: ChatModel,
+    generated: str,
+    delivered: str,
+    token_speed: float,
+):
+    generated_tokens, delivered_tokens = await token_lengths(
+        model.tokenizer, [generated, delivered]
+    )
+    stream_stats.finished("disconnected", generated_tokens, delivered_tokens)
+    logger.info(
+        f"Client left after {delivered_tokens} of {generated_tokens} generated tokens"
+    )
+    # Keep what the client was shown, the rest never reached anyone. Only rows
+    # this recorder wrote are touched, a regenerated answer the client saw
+    # nothing of leaves the message as it was
+    if recorder is not None and (delivered or recorder.written > 0):
+        await recorder.finish(delivered, delivered_tokens, token_speed)
+
+
+def observe_stream(model: str, outcome: str, progress: AnswerProgress):
+    # Once per stream, the per-chunk path only notes the first event time
+    chat_streams.labels(model, outcome).inc()
+    chat_stream_tokens.labels(model, outcome).inc(progress.total_tokens)
+    if progress.first_event_time is not None:
+        chat_stream_ttft.labels(model).observe(
+            progress.first_event_time - progress.start_time
+        )
+    if outcome in ("completed", "expired"):
+        chat_stream_token_speed.labels(model).observe(progress.token_speed)
+
+
+def finish_stream(
+    ticket: Ticket,
+    outcome: str | None,
+    recorder: AnswerRecorder | None,
+    model: ChatModel,
+    progress: AnswerProgress,
+):
+    if outcome is not None:
+        observe_stream(model.shortname, outcome, progress)
+    if outcome == "disconnected":
+        # Counting needs the executor and this task is being cancelled
+        job_pool.submit(
+            ("partial-answer", ticket),
+            record_partial_answer,
+            recorder,
+            model,
+            progress.answer,
+            progress.delivered_answer,
+            progress.token_speed,
+        )
+    elif outcome is not None:
+        stream_stats.finished(outcome, progress.total_tokens, progress.total_tokens)
+
+
+def user_key(request: ChatRequest, http_request: Request) -> str:
+    if request.email:
+        return request.email
+    if request.session_id is not None:
+        return f"session:{request.session_id}"
+    return f"host:{http_request.client.host if http_request.client else ''}"
+
+
+def chunk_size(chunk: BaseMessageChunk) -> int:
+    return len(chunk.content.encode())
+
 
-        yield "done"
+async def stream_answer(
+    request: ChatRequest,
+    upstream: AsyncIterator[BaseMessageChunk],
+    model: ChatModel,
+    ticket: Ticket,
+    entry: CacheEntry | None,
+):
+    outcome, progress = None, AnswerProgress(model.tokenizer, config.SSE_STATS_EVERY)
+    recorder = answer_recorder(request)
+    try:
+        async for update in queue_updates(ticket):
+            yield update
+        if not ticket.admitted:
+            return
 
-    return EventSourceResponse(event_generator())
+        outcome = "failed"
+        progress.start_time = time.time()
+        chunks = admission.until_deadline(ticket, upstream)
+        groups = coalesce(
+            chunks,
+            config.SSE_COALESCE_MS / 1000,
+            config.SSE_COALESCE_MAX_BYTES,
+            chunk_size,
+        )
+        try:
+            async for group in groups:
+                event = await progress.add(group)
+                if recorder is not None and recorder.due():
+                    recorder.flush(progress.answer)
+                yield event
+                # Resumed by the next read, so the client has this part
+                progress.delivered += 1
+            outcome = "completed"
+        except TimeoutError:
+            outcome = "expired"
+        finally:
+            # Drops the upstream connection at once if the client went away
+            await groups.aclose()
+            await chunks.aclose()
+
+        if outcome == "expired":
+            yield await progress.finish(error=DEADLINE_ERROR)
+        else:
+            yield await progress.finish()
+
+        if recorder is not None:
+            message_id = await recorder.finish(
+                progress.answer, progress.total_tokens, progress.token_speed
+            )
+            yield frame({"content": "", "messageId": message_id})
+
+        # Only answers that streamed to completion are worth replaying
+        if entry is not None and outcome == "completed":
+            await response_cache.set(
+                entry,
+                CachedResponse(
+                    progress.answer, progress.total_tokens, progress.token_speed
+                ),
+            )
+
+        yield DONE
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "disconnected"
+        raise
+    finally:
+        # A stream cut short by its client says nothing about upstream speed
+        admission.release(
+            ticket,
+            progress.token_speed if outcome in ("completed", "expired") else None,
+        )
+        finish_stream(ticket, outcome, recorder, model, progress)
+
+
+@router.post("/api/llm/chat/v1")
+async def llm_chat(request: ChatRequest, http_request: Request):
+    model = registered_model(request.model_id)
+    try:
+        params = model.schema.compile(request.params)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    # One tokenizer for the whole answer, even if a better one loads meanwhile
+    chat_model = model.chat_model()
+    messages = await build_messages(request, chat_model, params, config.GENERAL_PROMPT)
+    # Lazy, the whole transcript is only rendered when DEBUG is on
+    logger.opt(lazy=True).debug("Message: {}", lambda: messages)
+    logger.debug("Params: {}", params)
+    logger.debug("Model: {}", model.shortname)
+
+    entry = None
+    if response_cache.enabled:
+        entry = response_cache.entry("chat", model.fullname, params, messages)
+        cached = await response_cache.get(entry)
+        if cached is not None:
+            logger.debug("Replaying cached response")
+            return DrainingEventSourceResponse(replay(cached, answer_recorder(request)))
+
+    # Cache replays never reach the upstream, only live answers are admitted
+    try:
+        ticket = admission.admit(user_key(request, http_request))
+    except AdmissionRejected as exc:
+        raise HTTPException(
+            status_code=429,
+            detail=exc.reason,
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+
+    chat = model.llm(params)
+    stream = stream_answer(request, chat.astream(messages), chat_model, ticket, entry)
+
+    async def cleanup():
+        # Closing runs the generator's finally if the client left while a
+        # chunk was being sent; the release covers a generator never started
+        await stream.aclose()
+        admission.release(ticket)
+
+    return DrainingEventSourceResponse(stream, background=BackgroundTask(cleanup))
 
 
 if __name__ == "__main__":
     # pylint: disable=redefined-outer-name
-    import asyncio
-
     llm = get_llm(model="typhoon-v1.5x-70b-instruct")
     tokenizer_test = get_tokenizer(model_name="typhoon-v1.5x-70b-instruct")
     result = llm.invoke([HumanMessage(content="Hello, how are you?")])
@@ -1,22 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from loguru import logger
 
-from src.io.postgresql import get_session
-from src.models import LLM, LLMSchema
+from src.io.catalog import llm_catalog
+from src.models import LLMSchema
+from src import config
 
 
 router = APIRouter()
 
 
 @router.get("/api/llm/params/v1", response_model=list[LLMSchema])
-async def get_llms(session: AsyncSession = Depends(get_session)):
-    async with session.begin():
-        result = await session.execute(select(LLM))
-        llms = result.scalars().all()
-        logger.debug("llms found: ", llms)
+async def get_llms(request: Request):
+    # Served from the in-process catalog, reloaded whenever the llms table changes
+    llms = llm_catalog.llms
+    logger.debug("llms found: ", llms)
 
-        if not llms:
-            raise HTTPException(status_code=404, detail="No LLMs found")
-        return llms
+    if not llms:
+        raise HTTPException(status_code=404, detail="No LLMs found")
+
+    headers = {
+        "ETag": llm_catalog.etag,
+        "Cache-Control": f"max-age={config.CATALOG_MAX_AGE}, must-revalidate",
+    }
+    if request.headers.get("if-none-match") == llm_catalog.etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(llms, headers=headers)
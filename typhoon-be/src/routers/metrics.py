@@ -0,0 +1,176 @@
+import os
+
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from src.io.history import history_cache
+from src.io.jobs import job_pool
+from src.io.postgresql import engine
+from src.llmlib.admission import admission
+from src.llmlib.chatopenai import client_cache
+from src.llmlib.responsecache import response_cache
+from src.llmlib.streamstats import stream_stats
+from src.llmlib.tokenizer import tokenizer_registry
+from src.llmlib.transport import llm_transport
+from src.metrics import MULTIPROCESS
+
+
+class StatsCollector(Collector):
+    """Exposes the counters our caches, pools and queues already keep.
+
+    Read at scrape time, so they cost nothing on the request path. They are
+    per process: with several workers each scrape sees the worker that served
+    it, told apart by the ``pid`` label.
+    """
+
+    def __init__(self):
+        self.labels = ["pid"] if MULTIPROCESS else []
+
+    def _family(self, kind, name: str, documentation: str, value: float):
+        family = kind(name, documentation, labels=self.labels)
+        family.add_metric([str(os.getpid())] if self.labels else [], value)
+        return family
+
+    def counter(self, name: str, documentation: str, value: float):
+        return self._family(CounterMetricFamily, name, documentation, value)
+
+    def gauge(self, name: str, documentation: str, value: float):
+        return self._family(GaugeMetricFamily, name, documentation, value)
+
+    def collect(self):
+        clients = client_cache.stats()
+        yield self.counter(
+            "llm_client_cache_hits", "LLM client cache hits", clients["hits"]
+        )
+        yield self.counter(
+            "llm_client_cache_misses", "LLM client cache misses", clients["misses"]
+        )
+        yield self.counter(
+            "llm_client_cache_evictions",
+            "LLM clients evicted or expired",
+            clients["evictions"],
+        )
+        yield self.gauge("llm_client_cache_size", "Cached LLM clients", clients["size"])
+
+        responses, history = response_cache.stats(), history_cache.stats()
+        yield self.counter(
+            "response_cache_hits", "Exact response cache hits", responses["hits"]
+        )
+        yield self.counter(
+            "response_cache_similar_hits",
+            "Near-duplicate response cache hits",
+            responses["similar_hits"],
+        )
+        yield self.counter(
+            "response_cache_misses", "Response cache misses", responses["misses"]
+        )
+        yield self.counter(
+            "history_cache_hits", "Session history cache hits", history["hits"]
+        )
+        yield self.counter(
+            "history_cache_misses", "Session history cache misses", history["misses"]
+        )
+
+        tokenizers = tokenizer_registry.status()
+        yield self.gauge(
+            "tokenizers_loaded", "Loaded tokenizers", len(tokenizers["loaded"])
+        )
+        yield self.gauge(
+            "tokenizers_loading", "Tokenizers loading", len(tokenizers["loading"])
+        )
+        yield self.gauge(
+            "tokenizers_failed",
+            "Tokenizers that failed to load and are not retried yet",
+            len(tokenizers["failed"]),
+        )
+        yield self.gauge(
+            "tokenizer_memory_bytes",
+            "Estimated memory of the loaded tokenizers",
+            tokenizers["memory_used"],
+        )
+
+        transport = llm_transport.stats()
+        yield self.counter(
+            "llm_upstream_requests", "Requests sent upstream", transport["requests"]
+        )
+        yield self.counter(
+            "llm_upstream_wait_seconds",
+            "Time spent waiting for an upstream stream slot",
+            transport["wait_seconds"],
+        )
+        yield self.gauge(
+            "llm_upstream_in_flight", "Open upstream streams", transport["in_flight"]
+        )
+        yield self.gauge(
+            "llm_upstream_waiting",
+            "Requests waiting for an upstream stream slot",
+            transport["waiting"],
+        )
+
+        yield from self.collect_streams()
+
+        pool = engine.sync_engine.pool
+        yield self.gauge("db_pool_size", "Configured pool size", pool.size())
+        yield self.gauge("db_pool_checked_out", "Connections in use", pool.checkedout())
+        yield self.gauge(
+            "db_pool_overflow",
+            "Connections open beyond the pool size",
+            # Negative while the pool itself is not full yet
+            max(0, pool.overflow()),
+        )
+
+        jobs = job_pool.stats()
+        for outcome in ("completed", "failed", "retried", "dropped"):
+            yield self.counter(
+                f"jobs_{outcome}", f"Background jobs {outcome}", jobs[outcome]
+            )
+        yield self.gauge("jobs_queued", "Background jobs waiting", jobs["queued"])
+
+    def collect_streams(self):
+        stats = admission.stats()
+        for outcome in ("admitted", "queued", "rejected", "timed_out", "expired"):
+            yield self.counter(
+                f"admission_{outcome}", f"Chat streams {outcome}", stats[outcome]
+            )
+        yield self.gauge("admission_limit", "Current chat stream limit", stats["limit"])
+        yield self.gauge(
+            "admission_in_flight", "Chat streams in flight", stats["in_flight"]
+        )
+        yield self.gauge(
+            "admission_queue_length", "Chat streams waiting", stats["queued_now"]
+        )
+        yield self.counter(
+            "chat_delivered_tokens",
+            "Output tokens that reached the client",
+            stream_stats.delivered_tokens,
+        )
+        yield self.counter(
+            "chat_wasted_tokens",
+            "Output tokens generated after the client left",
+            stream_stats.wasted_tokens,
+        )
+
+
+router = APIRouter()
+stats_collector = StatsCollector()
+
+if MULTIPROCESS:
+    # Histograms and counters live in files shared by all workers
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+else:
+    registry = REGISTRY
+registry.register(stats_collector)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
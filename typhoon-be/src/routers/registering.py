@@ -1,27 +1,27 @@
 import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from pydantic import BaseModel
-from langchain_core.messages import HumanMessage
 from loguru import logger
 
-from src.io.postgresql import get_session
+from src.io.postgresql import async_session, get_session
+from src.io.jobs import job_pool
+from src.io import messages as messages_io
+from src.io.writebehind import message_writer
+from src.io.history import history_cache
 from src.models import (
     User,
     ChatSession,
     Message,
+    MessageVersion,
     RoleEnum,
     PreferenceEnum,
 )
-from src.llmlib.chatopenai import get_llm
-from src import config
-
-
-class Model(BaseModel):
-    shortname: str
-    fullname: str
+from src.llmlib.registry import model_registry
+from src.llmlib.titles import title_generator
 
 
 class RegisterMessageRequest(BaseModel):
@@ -32,7 +32,8 @@ class RegisterMessageRequest(BaseModel):
     role: RoleEnum
     session_id: int = None
     message_id: int = None
-    model: Model
+    # llms.id of the model that answers in this session
+    model_id: int
 
 
 class RegisterUserRequest(BaseModel):
@@ -47,123 +48,110 @@ class PreferenceRequest(BaseModel):
 router = APIRouter()
 
 
-async def comeup_with_sesion_name(
-    shortname: str, user_msg: str, session_id: int, session: AsyncSession
-):
-    logger.info("Generating session name in background task")
-    llm = get_llm(model=shortname)
-    ans = await llm.ainvoke(
-        [
-            config.GET_SESSION_NAME_PROMPT,
-            HumanMessage(content=f"{user_msg}\nช่วยคิดชื่อเท่ห์จากข้อความข้างต้นหน่อยนะครับ"),
-        ]
-    )
+async def comeup_with_sesion_name(shortname: str, user_msg: str, session_id: int):
+    logger.info("Generating session name in background job")
+    subject = await title_generator.generate(user_msg, shortname)
 
-    async with session.begin():
-        result = await session.execute(
-            select(ChatSession).where(ChatSession.id == session_id)
+    # Only hold a connection for the UPDATE itself, not while the title is generated
+    async with async_session() as session, session.begin():
+        await session.execute(
+            update(ChatSession)
+            .where(ChatSession.id == session_id)
+            .values(
+                subject=subject,
+                updated_at=datetime.datetime.now(datetime.timezone.utc),
+            )
         )
-        chat_session = result.scalars().first()
-        chat_session.updated_at = datetime.datetime.now(datetime.timezone.utc)
-        chat_session.subject = ans.content
-        await session.commit()
 
-    logger.debug(f"Session name generated: {ans.content}")
+    logger.debug(f"Session name generated: {subject}")
     logger.info("Session name updated in database")
 
 
 @router.post("/api/messages/register/v1")
 async def register_message(
     request: RegisterMessageRequest,
-    background_tasks: BackgroundTasks,
     session: AsyncSession = Depends(get_session),
 ):
     logger.debug(f"Registering message: {request}")
+    model = model_registry.get(request.model_id)
+    if model is None:
+        raise HTTPException(status_code=404, detail="Model not found")
     record_datetime = datetime.datetime.now(datetime.timezone.utc)
-    async with session.begin():
-        logger.debug("Fetching user")
-        result = await session.execute(select(User).where(User.email == request.email))
-        user = result.scalars().first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        # If message_id is provided, fetch the message
+    if message_writer.running and request.session_id and not request.message_id:
+        registered = await message_writer.register(
+            session,
+            email=request.email,
+            message=request.message,
+            tokens=request.tokens,
+            token_speed=request.tokenSpeed,
+            role=request.role,
+            record_datetime=record_datetime,
+            session_id=request.session_id,
+        )
+    else:
         if request.message_id:
-            logger.debug("Message ID provided, fetching message")
-            result = await session.execute(
-                select(Message).where(Message.id == request.message_id)
-            )
-            message = result.scalars().first()
-            if not message:
-                raise HTTPException(status_code=404, detail="Message not found")
+            await message_writer.wait_for(request.message_id)
+        registered = await messages_io.register_message(
+            session,
+            email=request.email,
+            message=request.message,
+            tokens=request.tokens,
+            token_speed=request.tokenSpeed,
+            role=request.role,
+            record_datetime=record_datetime,
+            session_id=request.session_id,
+            message_id=request.message_id,
+        )
 
-            message.message = request.message
-            message.total_tokens = request.tokens
-            message.token_speed = str(request.tokenSpeed)
-            message.updated_at = record_datetime
+    if registered.user_id is None:
+        raise HTTPException(status_code=404, detail="User not found")
 
-            await session.commit()
+    if request.message_id:
+        if registered.message_id is None:
+            raise HTTPException(status_code=404, detail="Message not found")
+        history_cache.update(
+            registered.session_id,
+            registered.message_id,
+            request.message,
+            request.tokens,
+        )
+        return {
+            "message": "Re-recorded message successfully",
+            "session_id": registered.session_id,
+            "message_id": registered.message_id,
+        }
 
-            return {
-                "message": "Re-recorded message successfully",
-                "session_id": message.chat_session_id,
-                "message_id": message.id,
-            }
+    if registered.session_id is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
 
-        # If session_id is provided, fetch the chat session
-        chat_session = None
-        if request.session_id:
-            logger.debug("Session ID provided, fetching chat session")
-            result = await session.execute(
-                select(ChatSession).where(
-                    ChatSession.id == request.session_id, ChatSession.user_id == user.id
-                )
-            )
-            chat_session = result.scalars().first()
-            if not chat_session:
-                raise HTTPException(status_code=404, detail="Chat session not found")
-
-        # If session_id is not provided, create a new one
-        if not chat_session:
-            logger.debug("No session_id provided, creating a new session")
-
-            chat_session = ChatSession(
-                user_id=user.id,
-                subject="New chat session",
-                created_at=record_datetime,
-                updated_at=record_datetime,
-            )
-            session.add(chat_session)
-            await session.flush()  # Ensure the chat session ID is generated
-
-            # Identify session subject using LLM and update the session name
-            # in backgroun dtask
-            background_tasks.add_task(
-                comeup_with_sesion_name,
-                request.model.shortname,
-                request.message,
-                chat_session.id,
-                session,
-            )
+    history_cache.append(
+        registered.session_id,
+        registered.message_id,
+        request.role,
+        request.message,
+        request.tokens,
+        new_session=registered.new_session,
+    )
 
-        # Create a new message
-        new_message = Message(
-            chat_session_id=chat_session.id,
-            message=request.message,
-            role=request.role,
-            total_tokens=request.tokens,
-            token_speed=str(request.tokenSpeed),
-            created_at=record_datetime,
-            updated_at=record_datetime,
+    if registered.new_session:
+        message_writer.remember_session(
+            request.email, registered.session_id, registered.user_id
         )
-        session.add(new_message)
-        await session.commit()
 
-        return {
-            "message": "Message registered successfully",
-            "session_id": chat_session.id,
-            "message_id": new_message.id,
-        }
+        # Identify session subject and update the session name in a background job
+        job_pool.submit(
+            ("session-name", registered.session_id),
+            comeup_with_sesion_name,
+            model.shortname,
+            request.message,
+            registered.session_id,
+        )
+
+    return {
+        "message": "Message registered successfully",
+        "session_id": registered.session_id,
+        "message_id": registered.message_id,
+    }
 
 
 @router.post("/api/users/register/v1")
@@ -204,19 +192,25 @@ async def submit_preference(
     session: AsyncSession = Depends(get_session),
 ):
     logger.debug(f"Submitting preference: {request}")
+    await message_writer.wait_for(request.message_id)
 
     async with session.begin():
+        # Rates the version the user is looking at, earlier ones keep theirs
         result = await session.execute(
-            select(Message).where(Message.id == request.message_id)
+            update(MessageVersion)
+            .where(
+                MessageVersion.id == Message.current_version_id,
+                Message.id == request.message_id,
+            )
+            .values(preference=request.preference)
+            .returning(MessageVersion.message_id)
+            .execution_options(synchronize_session=False)
         )
-        message = result.scalars().first()
-        if not message:
+        message_id = result.scalar()
+        if message_id is None:
             raise HTTPException(status_code=404, detail="Message not found")
 
-        message.preference = request.preference
-        await session.commit()
-
         return {
             "message": "Preference submitted successfully",
-            "message_id": message.id,
+            "message_id": message_id,
         }
@@ -1,41 +1,133 @@
-from fastapi import APIRouter, Depends
+import datetime
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, true, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from src.io.partitions import since_session_start
 from src.io.postgresql import get_session
-from src.models import User, ChatSession, ChatSessionSchema, Message, MessageSchema
+from src.io.writebehind import message_writer
+from src.models import (
+    User,
+    ChatSession,
+    ChatSessionSummarySchema,
+    Message,
+    MessageSchema,
+    MessageVersion,
+)
+from src import config
 
 router = APIRouter()
 
 
 @router.get(
-    "/api/users/{email}/chat_sessions/v1", response_model=list[ChatSessionSchema]
+    "/api/users/{email}/chat_sessions/v1", response_model=list[ChatSessionSummarySchema]
 )
 async def get_user_chat_sessions(
-    email: str, session: AsyncSession = Depends(get_session)
+    email: str,
+    limit: int | None = Query(None, ge=1, le=config.HISTORY_PAGE_MAX),
+    before: datetime.datetime | None = None,
+    before_id: int | None = None,
+    session: AsyncSession = Depends(get_session),
 ):
-    async with session.begin():
-        result = await session.execute(select(User).where(User.email == email))
-        user = result.scalars().first()
-        if not user:
-            # First time register will not have any chat sessions
-            return []
-
-        result = await session.execute(
-            select(ChatSession).where(ChatSession.user_id == user.id)
+    # One round trip: the session list and its per-session aggregates, read as
+    # plain rows instead of hydrating ORM entities
+    stats = (
+        select(
+            func.count(Message.id).label("message_count"),  # pylint: disable=not-callable
+            func.max(Message.created_at).label("last_message_at"),
+            func.coalesce(func.sum(MessageVersion.total_tokens), 0).label(
+                "total_tokens"
+            ),
+        )
+        .join(MessageVersion, MessageVersion.id == Message.current_version_id)
+        .where(
+            Message.chat_session_id == ChatSession.id,
+            since_session_start(ChatSession.created_at),
+        )
+        .lateral("stats")
+    )
+    # Newest first, served by ix_chat_sessions_user_id_updated_at.
+    # Pass the last item's updated_at and id as `before` and `before_id` to
+    # fetch the next page, the id breaks ties between equal timestamps.
+    query = (
+        select(
+            ChatSession.id,
+            ChatSession.user_id,
+            ChatSession.subject,
+            ChatSession.created_at,
+            ChatSession.updated_at,
+            stats.c.message_count,
+            stats.c.last_message_at,
+            stats.c.total_tokens,
         )
-        chat_sessions = result.scalars().all()
-        return chat_sessions
+        .join(User, ChatSession.user_id == User.id)
+        .join(stats, true())
+        .where(User.email == email)
+        .order_by(ChatSession.updated_at.desc(), ChatSession.id.desc())
+    )
+    if before is not None and before_id is not None:
+        query = query.where(
+            tuple_(ChatSession.updated_at, ChatSession.id) < (before, before_id)
+        )
+    elif before is not None:
+        query = query.where(ChatSession.updated_at < before)
+    if limit is not None:
+        query = query.limit(limit)
+
+    async with session.begin():
+        # First time register will not have any chat sessions
+        result = await session.execute(query)
+        return result.mappings().all()
 
 
 @router.get(
     "/api/chat_sessions/{session_id}/messages/v1", response_model=list[MessageSchema]
 )
 async def get_chat_session_messages(
-    session_id: int, session: AsyncSession = Depends(get_session)
+    session_id: int,
+    limit: int | None = Query(None, ge=1, le=config.HISTORY_PAGE_MAX),
+    before: datetime.datetime | None = None,
+    before_id: int | None = None,
+    session: AsyncSession = Depends(get_session),
 ):
+    # Read-your-writes for messages still queued by the write-behind writer
+    await message_writer.wait_for_session(session_id)
     async with session.begin():
-        result = await session.execute(
-            select(Message).where(Message.chat_session_id == session_id)
+        # Latest `limit` messages before (`before`, `before_id`), served by
+        # ix_messages_chat_session_id_created_at and returned oldest first.
+        # Each row fetches only its current version, by primary key.
+        # Partitions older than the session are pruned once its created_at is read.
+        started = (
+            select(ChatSession.created_at)
+            .where(ChatSession.id == session_id)
+            .scalar_subquery()
         )
-        messages = result.scalars().all()
-        return messages
+        query = (
+            select(
+                Message.id,
+                Message.chat_session_id,
+                MessageVersion.message,
+                Message.role,
+                MessageVersion.total_tokens,
+                MessageVersion.token_speed,
+                MessageVersion.preference,
+                Message.created_at,
+                Message.updated_at,
+            )
+            .join(MessageVersion, MessageVersion.id == Message.current_version_id)
+            .where(Message.chat_session_id == session_id, since_session_start(started))
+            .order_by(Message.created_at.desc(), Message.id.desc())
+        )
+        if before is not None and before_id is not None:
+            query = query.where(
+                tuple_(Message.created_at, Message.id) < (before, before_id)
+            )
+        elif before is not None:
+            query = query.where(Message.created_at < before)
+        if limit is not None:
+            query = query.limit(limit)
+
+        result = await session.execute(query)
+        messages = result.mappings().all()
+        return messages[::-1]
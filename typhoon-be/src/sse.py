@@ -0,0 +1,90 @@
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from typing import Any, TypeVar
+
+import anyio
+import orjson
+from loguru import logger
+from sse_starlette.sse import EventSourceResponse
+
+from src import config
+
+T = TypeVar("T")
+
+# Pre-encoded events; sse-starlette writes bytes as they are instead of
+# building a ServerSentEvent for every one
+DONE = b"data: done\r\n\r\n"
+
+
+def frame(payload: dict[str, Any]) -> bytes:
+    # orjson never emits a newline, so the payload is always a single data line
+    return b"data: " + orjson.dumps(payload) + b"\r\n\r\n"
+
+
+async def coalesce(
+    items: AsyncIterator[T],
+    interval: float,
+    max_size: int,
+    size: Callable[[T], int],
+) -> AsyncIterator[list[T]]:
+    """Groups items arriving within ``interval`` seconds of a group's first one.
+
+    A group is also closed once ``size`` of its items adds up to ``max_size``.
+    With a zero interval every item is its own group.
+    """
+    if interval <= 0:
+        async for item in items:
+            yield [item]
+        return
+
+    loop = asyncio.get_running_loop()
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(items))
+            try:
+                item = await pending
+            except StopAsyncIteration:
+                return
+            pending = None
+            group, total = [item], size(item)
+            flush_at = loop.time() + interval
+
+            while total < max_size:
+                pending = asyncio.ensure_future(anext(items))
+                done, _ = await asyncio.wait({pending}, timeout=flush_at - loop.time())
+                if not done:
+                    # Still waiting on the upstream, it opens the next group
+                    break
+                pending = None
+                try:
+                    item = done.pop().result()
+                except StopAsyncIteration:
+                    yield group
+                    return
+                group.append(item)
+                total += size(item)
+            yield group
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+
+
+class DrainingEventSourceResponse(EventSourceResponse):  # pylint: disable=abstract-method
+    """EventSourceResponse that lets a stream finish when the server shuts down.
+
+    sse-starlette ends every stream as soon as uvicorn gets a shutdown signal,
+    cutting answers off mid-sentence on each deploy. Here the stream keeps
+    going for up to SSE_DRAIN_TIMEOUT seconds after the signal and is only
+    cut if it is still running by then.
+    """
+
+    @staticmethod
+    async def listen_for_exit_signal() -> None:
+        await EventSourceResponse.listen_for_exit_signal()
+        logger.info(
+            f"Shutting down, draining SSE stream for {config.SSE_DRAIN_TIMEOUT}s"
+        )
+        await anyio.sleep(config.SSE_DRAIN_TIMEOUT)
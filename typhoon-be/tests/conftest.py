@@ -0,0 +1,5 @@
+import os
+
+# The engine is created on import and only connects on first use
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://localhost/typhoon")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
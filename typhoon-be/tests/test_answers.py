@@ -0,0 +1,38 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.io import answers
+from src.routers import llmchat
+
+
+def _record_writes(monkeypatch) -> list[dict]:
+    writes = []
+
+    async def write(*_, **kwargs):
+        writes.append(kwargs)
+
+    monkeypatch.setattr(answers.messages_io, "register_message", write)
+    monkeypatch.setattr(answers.messages_io, "append_message", write)
+    return writes
+
+
+def test_empty_regenerated_answer_is_not_written(monkeypatch):
+    writes = _record_writes(monkeypatch)
+    recorder = answers.AnswerRecorder("user@example.com", 1, 42, flush_interval=0)
+
+    assert asyncio.run(recorder.finish("", 0, 0.0)) is None
+    assert not writes
+
+
+def test_regenerate_disconnect_before_first_token_keeps_answer(monkeypatch):
+    writes = _record_writes(monkeypatch)
+
+    async def token_lengths(_, texts):
+        return [len(text) for text in texts]
+
+    monkeypatch.setattr(llmchat, "token_lengths", token_lengths)
+    recorder = answers.AnswerRecorder("user@example.com", 1, 42, flush_interval=0)
+    model = SimpleNamespace(tokenizer=None)
+
+    asyncio.run(llmchat.record_partial_answer(recorder, model, "Hello", "", 0.0))
+    assert not writes
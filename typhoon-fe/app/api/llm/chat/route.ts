@@ -50,8 +50,11 @@ interface Message {
 }
 
 interface ChatRequest {
+  session_id?: number;
+  message_id?: number;
+  email?: string;
   messages: Message[];
-  model: string;
+  model_id: number;
   params?: Record<string, any>;  // eslint-disable-line @typescript-eslint/no-explicit-any
 }
 
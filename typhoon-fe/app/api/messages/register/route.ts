@@ -11,10 +11,7 @@ type RegisterMessageRequest = {
   role: "user" | "assistant";
   session_id?: number; // Optional
   message_id?: number;
-  model: {
-    shortname: string;
-    fullname: string;
-  };
+  model_id: number;
 };
 
 type RegisterMessageResponse = {
@@ -61,7 +61,7 @@ export default function Chatbox() {
         tokens: 0,
         tokenSpeed: 0,
         role: "user",
-        model: modelName,
+        model_id: modelName.id,
         session_id: selectedHistoryIdx,
       },
       {
@@ -73,19 +73,17 @@ export default function Chatbox() {
     const userMetadata: MessageRegisterResponse = result.data;
     setInputValue("");
 
-    // init request body
+    // init request body, the backend restores earlier turns from the session
     const requestBody = {
+      session_id: userMetadata.session_id,
+      email: session?.user?.email || undefined,
       messages: [
-        ...messages.map((msg) => ({
-          role: msg.isbot ? "bot" : "user",
-          content: msg.content,
-        })),
         {
           role: "user",
           content: inputValue,
         },
       ],
-      model: modelName,
+      model_id: modelName.id,
       params: modelParams,
     };
 
@@ -104,6 +102,8 @@ export default function Chatbox() {
     };
 
     setMessages([...messages, userMessage, botMessage]);
+    // The backend stores the answer as it streams and reports its id at the end
+    let botMessageId: number | undefined;
 
     try {
       const es = createEventSource({
@@ -125,10 +125,20 @@ export default function Chatbox() {
             break;
           } else {
             const jsonifyData = JSON.parse(data);
+            // Still waiting for a free slot on the backend, nothing to show yet
+            if (jsonifyData.queued !== undefined) {
+              continue;
+            }
+            if (jsonifyData.messageId !== undefined) {
+              botMessageId = jsonifyData.messageId ?? undefined;
+              continue;
+            }
             botMessageBuffer.current = {
               content: botMessageBuffer.current.content + jsonifyData.content,
-              tokens: jsonifyData.tokens || 0,
-              tokenSpeed: jsonifyData.tokenSpeed || 0,
+              // Stats are not sent on every event, keep the last ones seen
+              tokens: jsonifyData.tokens ?? botMessageBuffer.current.tokens,
+              tokenSpeed:
+                jsonifyData.tokenSpeed ?? botMessageBuffer.current.tokenSpeed,
             };
 
             setMessages((prevMessages) => {
@@ -146,25 +156,6 @@ export default function Chatbox() {
           }
         }
 
-        // register bot message
-        const botMsgMetadata = await axios.post<MessageRegisterResponse>(
-          "/api/messages/register",
-          {
-            email: session?.user?.email || "",
-            message: botMessageBuffer.current.content,
-            tokens: botMessageBuffer.current.tokens,
-            tokenSpeed: botMessageBuffer.current.tokenSpeed,
-            role: "bot",
-            model: modelName,
-            session_id: userMetadata.session_id,
-          },
-          {
-            headers: {
-              "Content-Type": "application/json",
-            },
-          }
-        );
-
         setMessages((prevMessages) => {
           // Update IDs for bot&user messages
           prevMessages[prevMessages.length - 2] = {
@@ -173,7 +164,7 @@ export default function Chatbox() {
           };
           prevMessages[prevMessages.length - 1] = {
             ...prevMessages[prevMessages.length - 1],
-            message_id: botMsgMetadata.data.message_id,
+            message_id: botMessageId,
           };
           return prevMessages;
         });
@@ -182,7 +173,6 @@ export default function Chatbox() {
         console.error("Error with SSE stream:", error);
       } finally {
         es.close();
-        // register bot message
       }
     } catch (error) {
       console.error("Error with SSE stream:", error);
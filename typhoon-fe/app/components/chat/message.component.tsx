@@ -8,7 +8,6 @@ import { useState } from "react";
 import useStore from "@/stores/statestore";
 import { useShallow } from "zustand/shallow";
 import { useRef } from "react";
-import { MessageRegisterResponse } from "./chatbox.component";
 import { useSession } from "next-auth/react";
 
 export const StyledMessage = ({
@@ -99,8 +98,11 @@ export const StyledMessage = ({
           content: messages[messages.length - 2].content,
         },
       ],
-      model: modelName,
+      model_id: modelName.id,
       params: modelParams,
+      // The backend re-records the answer into this message as it streams
+      email: session?.user?.email || undefined,
+      message_id: messages[messages.length - 1].message_id,
     };
 
     try {
@@ -123,10 +125,18 @@ export const StyledMessage = ({
             break;
           } else {
             const jsonifyData = JSON.parse(data);
+            if (
+              jsonifyData.queued !== undefined ||
+              jsonifyData.messageId !== undefined
+            ) {
+              continue;
+            }
             botMessageBuffer.current = {
               content: botMessageBuffer.current.content + jsonifyData.content,
-              tokens: jsonifyData.tokens || 0,
-              tokenSpeed: jsonifyData.tokenSpeed || 0,
+              // Stats are not sent on every event, keep the last ones seen
+              tokens: jsonifyData.tokens ?? botMessageBuffer.current.tokens,
+              tokenSpeed:
+                jsonifyData.tokenSpeed ?? botMessageBuffer.current.tokenSpeed,
             };
 
             setMessages((prevMessages) => {
@@ -143,30 +153,10 @@ export const StyledMessage = ({
             });
           }
         }
-
-        // register bot message
-        await axios.post<MessageRegisterResponse>(
-          "/api/messages/register",
-          {
-            email: session?.user?.email || "",
-            message: botMessageBuffer.current.content,
-            tokens: botMessageBuffer.current.tokens,
-            tokenSpeed: botMessageBuffer.current.tokenSpeed,
-            role: "bot",
-            model: modelName,
-            message_id: messages[messages.length - 1].message_id,
-          },
-          {
-            headers: {
-              "Content-Type": "application/json",
-            },
-          }
-        );
       } catch (error) {
         console.error("Error with SSE stream:", error);
       } finally {
         es.close();
-        // register bot message
       }
     } catch (error) {
       console.error("Error with SSE stream:", error);
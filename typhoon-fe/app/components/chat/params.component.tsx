@@ -47,6 +47,7 @@ export default function ParameterAdjustment() {
   useEffect(() => {
     if (data && data.length > 0 && !modelName.shortname) {
       setModelName({
+        id: data[0].id,
         shortname: data[0].shortname,
         fullname: data[0].fullname,
       });
@@ -76,7 +77,11 @@ export default function ParameterAdjustment() {
     if (data) {
       const metadata = data.find((model) => model.shortname === name);
       const metadataParams = metadata?.params;
-      setModelName({ shortname: name, fullname: metadata?.fullname || "" });
+      setModelName({
+        id: metadata?.id || 0,
+        shortname: name,
+        fullname: metadata?.fullname || "",
+      });
       const capParams = allParamNames.reduce((acc, param) => {
         acc[param.fieldName] = Math.min(
           Math.max(
@@ -15,14 +15,17 @@ type ModelParams = {
 type ModelStore = {
   modelParams: ModelParams;
   modelName: {
+    id: number;
     shortname: string;
     fullname: string;
   };
   setModelParams: (model: ModelParams) => void;
   setModelName: ({
+    id,
     shortname,
     fullname,
   }: {
+    id: number;
     shortname: string;
     fullname: string;
   }) => void;
@@ -37,17 +40,20 @@ const createParamsStore: StateCreator<ModelStore> = (set) => ({
     repetitionPenalty: 1,
   },
   modelName: {
+    id: 0,
     shortname: "",
     fullname: "",
   },
   setModelParams: (modelParams: ModelParams) => set({ modelParams }),
   setModelName: ({
+    id,
     shortname,
     fullname,
   }: {
+    id: number;
     shortname: string;
     fullname: string;
-  }) => set({ modelName: { shortname, fullname } }),
+  }) => set({ modelName: { id, shortname, fullname } }),
 });
 
 // Chat history store